@@ -1,14 +1,259 @@
-from fastapi import APIRouter, Response
+import contextlib
+import dataclasses
+import functools
+import json
+import uuid
+from pathlib import Path
+from typing import AsyncIterator, List, Optional
 
-from models.ifc_schemas import IfcBeamCreateRequest
+from fastapi import APIRouter, HTTPException, Query, Request, Response, WebSocket
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import FileResponse, StreamingResponse
+from pydantic import ValidationError
+from starlette.background import BackgroundTask
+
+from models.ifc_schemas import IfcBeamCreateRequest, IfcBeamsCreateRequest
+from services.admission import AdmissionController, AdmissionError, AdmissionRejected, AdmissionTicket
+from services.build_progress import BuildProgress, run_to_completion, stream_build_progress
+from services.element_ingest import SUPPORTED_MEDIA_TYPES, TYPICAL_ROW_BYTES, ingest_beams
 from services.ifc_creator import create_ifc_file
+from services.ifc_model_manager import OUTPUT_DIR
+from services.ifc_model_manager_factory import IfcModelManagerFactory, beam_dto_from_row, create_ifc_beams_file
+from services.model_compactor import compact_file
+from services.model_diff import diff_files
+from services.model_partitioner import Partitioning, StoreyPartitioning, TilePartitioning
+from services.schema_fan_out import SUPPORTED_SCHEMAS, SchemaFanOut, normalize_schemas, write_archive
+from services.scheduler import GenerationScheduler, SlotUnavailable
 
 router = APIRouter()
+admission_controller = AdmissionController.from_environment()
+scheduler = GenerationScheduler.from_environment()
+schema_fan_out = SchemaFanOut.from_environment()
+
+
+@contextlib.asynccontextmanager
+async def _build_slot(element_count: Optional[int], *schemas: str) -> AsyncIterator[AdmissionTicket]:
+    """Scheduler slot first, then memory: only builds that are about to run hold a reservation,
+    so bulk jobs queued in the scheduler cannot starve small requests of memory.
+    A full scheduler queue or a timed-out wait is rejected like a full admission queue (429)."""
+    estimate = admission_controller.check(element_count, *schemas)
+    try:
+        async with scheduler.slot(element_count), admission_controller.admit(element_count, *schemas) as ticket:
+            yield ticket
+    except SlotUnavailable as exc:
+        raise AdmissionRejected(str(exc), estimate) from None
 
 
 @router.post("/create_ifc_beam")
 async def create_ifc_beam(data: IfcBeamCreateRequest):
-    path = create_ifc_file(data)
+    async with _build_slot(1, "IFC4"):
+        path = await run_to_completion(create_ifc_file, data)
     with open(path, "rb") as f:
         return Response(content=f.read(), media_type="application/octet-stream",
                         headers={"Content-Disposition": f"attachment; filename=beam.ifc"})
+
+
+def _check_schema(schema: str) -> None:
+    try:
+        IfcModelManagerFactory.create_manager(schema)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
+def _partitioning(partition: Optional[str], tile_size: Optional[float]) -> Optional[Partitioning]:
+    if partition is None:
+        return None
+    if partition == "storey":
+        return StoreyPartitioning()
+    if partition == "tile" and tile_size is not None and tile_size > 0:
+        return TilePartitioning(tile_size)
+    raise HTTPException(status_code=400, detail="partition must be 'storey', or 'tile' with a positive tile_size")
+
+
+@router.post("/create_ifc_beams")
+async def create_ifc_beams(data: IfcBeamsCreateRequest, request: Request, schema: str = "IFC4",
+                           compact: bool = False, partition: Optional[str] = None,
+                           tile_size: Optional[float] = None):
+    """Build one model; with ``partition`` one file per storey or tile plus a manifest"""
+    _check_schema(schema)
+    partitioning = _partitioning(partition, tile_size)
+    progress = BuildProgress(elements_total=len(data.beams))
+    async with _build_slot(len(data.beams), schema) as ticket:
+        path = Path(await run_to_completion(create_ifc_beams_file, data.beams, schema, progress,
+                                            compact, partitioning))
+        ticket.entities = progress.entities
+    response = {"created": len(data.beams), "entities": progress.entities,
+                "artifact": str(request.url_for("get_artifact", name=path.name))}
+    if partitioning is not None:
+        manifest = json.loads(path.read_text())
+        response["partitions"] = [str(request.url_for("get_artifact", name=partition["file"]))
+                                  for partition in manifest["partitions"]]
+    return response
+
+
+@router.post("/create_ifc_beams/schemas")
+async def create_ifc_beams_for_schemas(data: IfcBeamsCreateRequest, request: Request,
+                                       schemas: List[str] = Query(list(SUPPORTED_SCHEMAS)),
+                                       archive: bool = False, compact: bool = False):
+    """Build the same beams in several schemas in parallel, as one zip or one artifact per schema"""
+    try:
+        schemas = normalize_schemas(schemas)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+    beams = [beam_dto_from_row(row) for row in data.beams]
+    async with _build_slot(len(beams), *schemas):
+        artifacts = await schema_fan_out.build(beams, schemas, compact)
+
+    if archive:
+        path = Path(await run_in_threadpool(write_archive, artifacts))
+        return {"created": len(beams), "schemas": schemas,
+                "artifact": str(request.url_for("get_artifact", name=path.name))}
+    return {"created": len(beams), "artifacts": {
+        artifact.schema: {"entities": artifact.entities,
+                          "artifact": str(request.url_for("get_artifact", name=Path(artifact.path).name))}
+        for artifact in artifacts}}
+
+
+async def _progress_events(data: IfcBeamsCreateRequest, schema: str, url_for, ticket: AdmissionTicket):
+    """Progress events of a beams build; ``complete`` carries the artifact link instead of the path"""
+    build = functools.partial(create_ifc_beams_file, data.beams, schema)
+    progress = BuildProgress(elements_total=len(data.beams))
+    async for event in stream_build_progress(build, progress):
+        if event["event"] == "complete":
+            ticket.entities = progress.entities
+            event = {"event": "complete", "artifact": str(url_for("get_artifact", name=Path(event.pop("path")).name))}
+        yield event
+
+
+@router.post("/create_ifc_beams/progress")
+async def create_ifc_beams_with_progress(data: IfcBeamsCreateRequest, request: Request, schema: str = "IFC4"):
+    """Same as /create_ifc_beams, streaming progress as NDJSON while the model is built"""
+    _check_schema(schema)
+    # Admit before the response starts so rejections can still be sent as 413/429
+    admission = contextlib.AsyncExitStack()
+    ticket = await admission.enter_async_context(_build_slot(len(data.beams), schema))
+
+    async def lines():
+        try:
+            async for event in _progress_events(data, schema, request.url_for, ticket):
+                yield json.dumps(event) + "\n"
+        finally:
+            await admission.aclose()
+
+    # The background task releases the admission if the client left before streaming began
+    return StreamingResponse(lines(), media_type="application/x-ndjson", background=BackgroundTask(admission.aclose))
+
+
+@router.websocket("/create_ifc_beams/ws")
+async def create_ifc_beams_over_websocket(websocket: WebSocket, schema: str = "IFC4"):
+    """Receives one IfcBeamsCreateRequest, sends progress events, then closes"""
+    await websocket.accept()
+    try:
+        data = IfcBeamsCreateRequest.model_validate(await websocket.receive_json())
+        IfcModelManagerFactory.create_manager(schema)
+    except ValueError as exc:
+        detail = exc.errors(include_url=False, include_context=False) if isinstance(exc, ValidationError) else str(exc)
+        await websocket.send_json({"event": "error", "detail": detail})
+        await websocket.close(code=1003)
+        return
+
+    try:
+        async with _build_slot(len(data.beams), schema) as ticket:
+            async for event in _progress_events(data, schema, websocket.url_for, ticket):
+                await websocket.send_json(event)
+    except AdmissionError as exc:
+        await websocket.send_json({"event": "error", "detail": str(exc)})
+        await websocket.close(code=1013)
+        return
+    await websocket.close()
+
+
+@router.post("/create_ifc_beams/upload")
+async def upload_ifc_beams(request: Request, schema: str = "IFC4", compact: bool = False):
+    """Build a model from a CSV or NDJSON member list streamed in the request body"""
+    media_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+    if media_type not in SUPPORTED_MEDIA_TYPES:
+        raise HTTPException(status_code=415,
+                            detail=f"Content-Type must be one of {', '.join(SUPPORTED_MEDIA_TYPES)}")
+    try:
+        manager = IfcModelManagerFactory.create_manager(schema)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+    # The row count is guessed from the Content-Length and corrected once the list is parsed;
+    # without a Content-Length the upload reserves the whole budget until then
+    content_length = request.headers.get("content-length")
+    element_count = int(content_length) // TYPICAL_ROW_BYTES[media_type] if content_length else None
+    progress = BuildProgress(elements_total=element_count)
+    async with _build_slot(element_count, schema) as ticket:
+        manager.track_progress(progress).create_file().initialize_model()
+        try:
+            report = await ingest_beams(manager, request.stream(), media_type)
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=str(exc))
+        await admission_controller.resize(ticket, report.created)
+        progress.elements_total = report.created
+
+        path = Path(await run_to_completion(manager.save, compact=compact))
+        ticket.entities = progress.entities
+    compaction = dataclasses.asdict(manager.compaction) if manager.compaction else None
+    return {**dataclasses.asdict(report), "compaction": compaction,
+            "artifact": str(request.url_for("get_artifact", name=path.name))}
+
+
+@router.post("/compact")
+async def compact_ifc(request: Request):
+    """Deduplicate and purge an IFC-SPF file streamed in the request body"""
+    OUTPUT_DIR.mkdir(exist_ok=True)
+    source = OUTPUT_DIR / f"{uuid.uuid4()}.upload"
+    target = OUTPUT_DIR / f"{uuid.uuid4()}.ifc"
+    try:
+        with open(source, "wb") as f:
+            async for chunk in request.stream():
+                f.write(chunk)
+        # The schema and size are only known once the file is parsed, so it takes the whole budget
+        async with _build_slot(None, "IFC4"):
+            try:
+                report = await run_to_completion(compact_file, str(source), str(target))
+            except ValueError as exc:
+                raise HTTPException(status_code=400, detail=str(exc))
+    finally:
+        source.unlink(missing_ok=True)
+    return {**dataclasses.asdict(report), "artifact": str(request.url_for("get_artifact", name=target.name))}
+
+
+def _artifact_path(name: str) -> Path:
+    path = OUTPUT_DIR / name
+    if Path(name).name != name or not path.is_file():
+        raise HTTPException(status_code=404, detail="Artifact not found")
+    return path
+
+
+@router.get("/diff")
+async def diff_artifacts(old: str, new: str):
+    """Elements added, removed and modified between two generated artifacts, matched by GlobalId"""
+    old_path, new_path = _artifact_path(old), _artifact_path(new)
+    try:
+        diff = await scheduler.run(None, diff_files, str(old_path), str(new_path))
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    return dataclasses.asdict(diff)
+
+
+@router.get("/admission")
+async def get_admission_stats():
+    """Budget usage and estimated vs. actual cost of recent builds, for recalibrating the cost model"""
+    return admission_controller.stats()
+
+
+@router.get("/scheduler")
+async def get_scheduler_stats():
+    """Queue depth, running builds and wait times per lane"""
+    return scheduler.stats()
+
+
+@router.get("/artifacts/{name}")
+async def get_artifact(name: str):
+    path = _artifact_path(name)
+    return FileResponse(path, media_type="application/octet-stream", filename=name)
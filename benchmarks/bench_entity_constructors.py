@@ -0,0 +1,44 @@
+"""Per-entity cost of ``model.create_entity`` vs. the precompiled strategy constructors.
+
+Run from the repository root:  python -m benchmarks.bench_entity_constructors
+"""
+import argparse
+import timeit
+
+import ifcopenshell
+import ifcopenshell.guid
+
+from services.strategies.ifc2x3_strategy import IFC2X3Strategy
+from services.strategies.ifc4_strategy import IFC4Strategy
+from services.strategies.ifc4x3_strategy import IFC4X3Strategy
+
+
+def _cases(model: ifcopenshell.file):
+    """(type name, attributes) pairs resembling what IfcBeamCreator emits per beam"""
+    origin = model.create_entity("IfcCartesianPoint", Coordinates=(0.0, 0.0, 0.0))
+    placement = model.create_entity("IfcAxis2Placement3D", Location=origin)
+    return [
+        ("IfcCartesianPoint", {"Coordinates": (2.0, 0.0, 0.5)}),
+        ("IfcDirection", {"DirectionRatios": (0.0, 0.0, 1.0)}),
+        ("IfcLocalPlacement", {"PlacementRelTo": None, "RelativePlacement": placement}),
+        ("IfcBeam", {"GlobalId": ifcopenshell.guid.new(), "Name": "beam", "ObjectPlacement": None}),
+    ]
+
+
+def run(number: int) -> None:
+    print(f"{'schema':<8} {'entity':<20} {'create_entity':>14} {'constructor':>12} {'speedup':>8}")
+    for strategy in (IFC2X3Strategy(), IFC4Strategy(), IFC4X3Strategy()):
+        model = ifcopenshell.file(schema=strategy.get_schema())
+        entities = strategy.get_entity_constructors()
+        for type_name, attributes in _cases(model):
+            constructor = entities[type_name]
+            before = timeit.timeit(lambda: model.create_entity(type_name, **attributes), number=number)
+            after = timeit.timeit(lambda: constructor(model, **attributes), number=number)
+            print(f"{strategy.get_schema():<8} {type_name:<20} "
+                  f"{before / number * 1e6:>11.2f} us {after / number * 1e6:>9.2f} us {before / after:>7.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-n", "--number", type=int, default=20000, help="instances per entity type")
+    run(parser.parse_args().number)
@@ -0,0 +1,80 @@
+"""Build time of a beam model with logging off, at INFO, and at DEBUG sampled and unsampled.
+
+Log lines are formatted as JSON and written to os.devnull, so formatting is measured
+but terminal output is not.
+
+Run from the repository root:  python -m benchmarks.bench_logging
+"""
+import argparse
+import logging
+import os
+import time
+import timeit
+
+from core.structured_log import JsonFormatter, get_logger, log_context
+from models.ifc_schemas import IfcBeamRow
+from services import ifc_model_manager
+from services.ifc_model_manager_factory import beam_dto_from_row, create_beams_model
+
+MODES = (
+    ("off", logging.WARNING, ifc_model_manager.ELEMENT_LOG_SAMPLE),
+    ("info", logging.INFO, ifc_model_manager.ELEMENT_LOG_SAMPLE),
+    ("debug, sampled", logging.DEBUG, ifc_model_manager.ELEMENT_LOG_SAMPLE),
+    ("debug, every element", logging.DEBUG, 1),
+)
+
+
+class _CountingHandler(logging.StreamHandler):
+    def __init__(self, stream):
+        super().__init__(stream)
+        self.lines = 0
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.lines += 1
+        super().emit(record)
+
+
+def run(beams: int, repeat: int, schema: str) -> None:
+    dtos = [beam_dto_from_row(IfcBeamRow(name=f"Beam{i}", length=3.0, width=0.2, height=0.4, x=float(i)))
+            for i in range(beams)]
+    root = logging.getLogger()
+    with open(os.devnull, "w") as devnull:
+        handler = _CountingHandler(devnull)
+        handler.setFormatter(JsonFormatter())
+        root.addHandler(handler)
+        try:
+            print(f"{beams} beams, {schema}, best of {repeat}")
+            root.setLevel(logging.WARNING)
+            os.remove(create_beams_model(dtos, schema))  # warm-up
+            baseline = None
+            for label, level, sample in MODES:
+                root.setLevel(level)
+                ifc_model_manager.ELEMENT_LOG_SAMPLE = sample
+                best = float("inf")
+                for _ in range(repeat):
+                    handler.lines = 0
+                    start = time.perf_counter()
+                    with log_context(request_id="bench", schema=schema, element_count=beams):
+                        path = create_beams_model(dtos, schema)
+                    best = min(best, time.perf_counter() - start)
+                    os.remove(path)
+                baseline = baseline or best
+                print(f"  {label:<22} {best:8.3f} s  {best / baseline - 1:+7.1%}  {handler.lines:6d} lines")
+        finally:
+            root.removeHandler(handler)
+
+    log = get_logger("benchmarks.bench_logging")
+    root.setLevel(logging.WARNING)
+    number = 1_000_000
+    seconds = timeit.timeit(lambda: log.debug("element.added", sample=1000, element=dtos[0], elements=1),
+                            number=number)
+    print(f"  disabled debug call      {seconds / number * 1e9:8.0f} ns")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-b", "--beams", type=int, default=10000)
+    parser.add_argument("-r", "--repeat", type=int, default=3)
+    parser.add_argument("-s", "--schema", default="IFC4")
+    args = parser.parse_args()
+    run(args.beams, args.repeat, args.schema)
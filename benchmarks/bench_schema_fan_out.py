@@ -0,0 +1,57 @@
+"""Latency of building every schema one after another vs. fanned out to worker processes.
+
+Fan-out only pays off with a spare core per schema; on a single CPU SchemaFanOut builds
+in process, which this reports as "in process".
+
+Run from the repository root:  python -m benchmarks.bench_schema_fan_out
+"""
+import argparse
+import asyncio
+import os
+import time
+
+from models.ifc_schemas import IfcBeamRow
+from services.ifc_model_manager_factory import beam_dto_from_row, create_beams_model
+from services.schema_fan_out import SUPPORTED_SCHEMAS, SchemaFanOut
+
+
+def run(beams: int, repeat: int, workers: int) -> None:
+    dtos = [beam_dto_from_row(IfcBeamRow(name=f"Beam{i}", length=3.0, width=0.2, height=0.4, x=float(i)))
+            for i in range(beams)]
+    print(f"{beams} beams, schemas {', '.join(SUPPORTED_SCHEMAS)}, {os.cpu_count()} CPUs")
+
+    for schema in SUPPORTED_SCHEMAS:
+        start = time.perf_counter()
+        os.remove(create_beams_model(dtos, schema))
+        print(f"  {schema:<8} alone      {time.perf_counter() - start:8.3f} s")
+
+    start = time.perf_counter()
+    for schema in SUPPORTED_SCHEMAS:
+        os.remove(create_beams_model(dtos, schema))
+    print(f"  sequential          {time.perf_counter() - start:8.3f} s")
+
+    async def fan_out_runs():
+        fan_out = SchemaFanOut(workers)
+        label = "in process" if fan_out.in_process else "fan-out"
+        try:
+            # The first run pays for starting the worker processes
+            for attempt in range(repeat + 1):
+                start = time.perf_counter()
+                artifacts = await fan_out.build(dtos, SUPPORTED_SCHEMAS)
+                elapsed = time.perf_counter() - start
+                for artifact in artifacts:
+                    os.remove(artifact.path)
+                print(f"  {label + (' (cold)' if attempt == 0 else ' (warm)'):<19} {elapsed:8.3f} s")
+        finally:
+            fan_out.shutdown()
+
+    asyncio.run(fan_out_runs())
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("-b", "--beams", type=int, default=3000)
+    parser.add_argument("-r", "--repeat", type=int, default=2, help="warm fan-out runs")
+    parser.add_argument("-w", "--workers", type=int, default=len(SUPPORTED_SCHEMAS))
+    args = parser.parse_args()
+    run(args.beams, args.repeat, args.workers)
@@ -0,0 +1,33 @@
+"""Calibrate the admission cost model from real IfcModelManager builds.
+
+Run from the repository root:  python -m benchmarks.calibrate_cost_model --output cost_model.json
+Point IFC_COST_MODEL at the written file to use it in the service.
+"""
+import argparse
+from pathlib import Path
+
+from services.admission import CostModel, calibrate
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--schemas", default="IFC2X3,IFC4,IFC4X3")
+    parser.add_argument("--element-counts", default="0,500,1000,2000,4000")
+    parser.add_argument("--output", type=Path, help="write the fitted cost model as JSON")
+    args = parser.parse_args()
+
+    records = calibrate(args.schemas.split(","), [int(count) for count in args.element_counts.split(",")])
+    print(f"{'schema':<8} {'elements':>8} {'entities':>9} {'est':>9} {'rss MB':>8} {'est':>8} {'s':>7} {'est':>7}")
+    for record in records:
+        print(f"{record.schema:<8} {record.element_count:>8} {record.actual.entities:>9} {record.estimate.entities:>9} "
+              f"{record.actual.memory_bytes / 2**20:>8.1f} {record.estimate.memory_bytes / 2**20:>8.1f} "
+              f"{record.actual.seconds:>7.3f} {record.estimate.seconds:>7.3f}")
+
+    model = CostModel.fit(records)
+    print(model.to_dict())
+    if args.output:
+        model.save(args.output)
+
+
+if __name__ == "__main__":
+    main()
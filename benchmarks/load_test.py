@@ -0,0 +1,416 @@
+"""Load test for the IFC Creator API: throughput, latency percentiles, error rate and worker RSS.
+
+In-process (drives main.app through ASGI, no server needed):
+    python -m benchmarks.load_test --requests 200 --concurrency 8 --mix single=8,bulk=2
+
+Over HTTP, against a running server or one spawned here (needs uvicorn installed):
+    python -m benchmarks.load_test --url http://127.0.0.1:8000 --pid <server pid>
+    python -m benchmarks.load_test --spawn-uvicorn --schemas IFC4,IFC2X3
+
+Results are written as JSON (see --output); pass an earlier file with --compare to print deltas.
+"""
+import argparse
+import asyncio
+import http.client
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import time
+import urllib.parse
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+RESULTS_DIR = Path("benchmarks") / "results"
+
+
+@dataclass(slots=True)
+class Scenario:
+    """A request shape: path plus a JSON body factory"""
+    name: str
+    path: str
+    body: Callable[[random.Random], Dict]
+
+
+def _beam(rng: random.Random, index: int, x: float = 0.0, y: float = 0.0, z: float = 0.0) -> Dict:
+    return {"name": f"Beam{index}", "length": round(rng.uniform(2.0, 8.0), 3),
+            "width": 0.2, "height": 0.4, "x": x, "y": y, "z": z}
+
+
+def _frame(rng: random.Random, bays: int = 20, storeys: int = 5) -> Dict:
+    """Beams along both grid directions of a ``bays`` x ``bays`` frame, repeated per storey"""
+    beams = []
+    for level in range(storeys):
+        for i in range(bays):
+            for j in range(bays):
+                beams.append(_beam(rng, len(beams), x=i * 5.0, y=j * 5.0, z=level * 3.0))
+                beams.append(_beam(rng, len(beams), x=j * 5.0, y=i * 5.0, z=level * 3.0))
+    return {"beams": beams}
+
+
+SCENARIOS = {
+    "single": Scenario("single", "/api/v1/create_ifc_beam",
+                       lambda rng: {"name": "Beam", "length": 5.0, "width": 0.2, "height": 0.4}),
+    "bulk": Scenario("bulk", "/api/v1/create_ifc_beams",
+                     lambda rng: {"beams": [_beam(rng, i, x=i * 0.5) for i in range(200)]}),
+    "frame": Scenario("frame", "/api/v1/create_ifc_beams", _frame),
+}
+
+# Routes that take the schema as query parameter
+SCHEMA_AWARE_PATHS = {"/api/v1/create_ifc_beams"}
+
+
+@dataclass(slots=True)
+class Sample:
+    scenario: str
+    schema: str
+    status: int
+    latency: float
+    response_bytes: int
+    error: Optional[str] = None
+
+
+@dataclass(slots=True)
+class RssSample:
+    elapsed: float
+    rss_kb: Optional[int]
+
+
+@dataclass
+class LoadTestResult:
+    config: Dict
+    started_at: float
+    duration: float = 0.0
+    samples: List[Sample] = field(default_factory=list)
+    rss: List[RssSample] = field(default_factory=list)
+
+
+def percentile(values: List[float], fraction: float) -> Optional[float]:
+    """Linearly interpolated percentile of ``values`` (``fraction`` in [0, 1])"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def read_rss_kb(pid: Optional[int] = None) -> Optional[int]:
+    """Resident set size of ``pid`` (default: this process) in kB, None where /proc is unavailable"""
+    try:
+        with open(f"/proc/{pid or os.getpid()}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def parse_mix(mix: str) -> Dict[str, int]:
+    weights = {}
+    for item in mix.split(","):
+        name, _, weight = item.partition("=")
+        if name not in SCENARIOS:
+            raise ValueError(f"Unknown scenario '{name}', expected one of {', '.join(SCENARIOS)}")
+        weights[name] = int(weight or 1)
+    return weights
+
+
+def plan_requests(weights: Dict[str, int], schemas: List[str], count: int,
+                  seed: int) -> List[Tuple[Scenario, str, str, bytes]]:
+    """Draw ``count`` (scenario, schema, url path, body) tuples; the same seed gives the same plan"""
+    rng = random.Random(seed)
+    names = list(weights)
+    bodies = {}
+    plan = []
+    for _ in range(count):
+        scenario = SCENARIOS[rng.choices(names, weights=[weights[name] for name in names])[0]]
+        schema = rng.choice(schemas)
+        path = scenario.path
+        if path in SCHEMA_AWARE_PATHS:
+            path += "?" + urllib.parse.urlencode({"schema": schema})
+        else:
+            # /create_ifc_beam always builds IFC4
+            schema = "IFC4"
+        # Bodies are reused per scenario so large frames are serialized once
+        if scenario.name not in bodies:
+            bodies[scenario.name] = json.dumps(scenario.body(rng)).encode()
+        plan.append((scenario, schema, path, bodies[scenario.name]))
+    return plan
+
+
+class AsgiTransport:
+    """Sends requests straight into an ASGI app, reading the whole response"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def post(self, path: str, body: bytes) -> Tuple[int, int]:
+        url = urllib.parse.urlsplit(path)
+        scope = {
+            "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "scheme": "http",
+            "method": "POST", "path": url.path, "raw_path": url.path.encode(), "root_path": "",
+            "query_string": url.query.encode(), "server": ("testserver", 80), "client": ("loadtest", 0),
+            "headers": [(b"host", b"testserver"), (b"content-type", b"application/json"),
+                        (b"content-length", str(len(body)).encode())],
+        }
+        response_complete = asyncio.Event()
+        request_sent = False
+        status = 0
+        size = 0
+
+        async def receive():
+            nonlocal request_sent
+            if not request_sent:
+                request_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            await response_complete.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+                if not message.get("more_body", False):
+                    response_complete.set()
+
+        await self.app(scope, receive, send)
+        return status, size
+
+    def close(self) -> None:
+        pass
+
+
+class HttpTransport:
+    """One keep-alive connection per worker; requests run in a thread so workers overlap"""
+
+    def __init__(self, base_url: str):
+        url = urllib.parse.urlsplit(base_url)
+        self._connection = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=600)
+
+    def _connect(self) -> None:
+        self._connection.connect()
+        # http.client sends headers and body in separate writes; without this, Nagle's
+        # algorithm and delayed ACKs add ~40ms to every request
+        self._connection.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def _request(self, path: str, body: bytes) -> http.client.HTTPResponse:
+        if self._connection.sock is None:
+            self._connect()
+        self._connection.request("POST", path, body=body, headers={"Content-Type": "application/json"})
+        return self._connection.getresponse()
+
+    def _post(self, path: str, body: bytes) -> Tuple[int, int]:
+        try:
+            response = self._request(path, body)
+        except (http.client.HTTPException, OSError):
+            # Reconnect once on a dropped keep-alive connection
+            self._connection.close()
+            response = self._request(path, body)
+        return response.status, len(response.read())
+
+    async def post(self, path: str, body: bytes) -> Tuple[int, int]:
+        return await asyncio.to_thread(self._post, path, body)
+
+    def close(self) -> None:
+        self._connection.close()
+
+
+async def _sample_rss(result: LoadTestResult, read_rss: Callable[[], Optional[int]], interval: float,
+                      stop: asyncio.Event) -> None:
+    start = time.perf_counter()
+    while True:
+        result.rss.append(RssSample(round(time.perf_counter() - start, 3), read_rss()))
+        try:
+            await asyncio.wait_for(stop.wait(), timeout=interval)
+            return
+        except asyncio.TimeoutError:
+            pass
+
+
+async def run_load_test(transport_factory: Callable[[], object], plan: List[Tuple[Scenario, str, str, bytes]],
+                        concurrency: int, config: Dict, read_rss: Optional[Callable[[], Optional[int]]] = None,
+                        rss_interval: float = 0.5) -> LoadTestResult:
+    """Run ``plan`` with ``concurrency`` workers, each with its own transport.
+
+    ``read_rss`` returns the worker RSS in kB and is sampled every ``rss_interval`` seconds.
+    """
+    result = LoadTestResult(config=config, started_at=time.time())
+    queue = asyncio.Queue()
+    for item in plan:
+        queue.put_nowait(item)
+
+    async def worker():
+        transport = transport_factory()
+        try:
+            while not queue.empty():
+                scenario, schema, path, body = queue.get_nowait()
+                start = time.perf_counter()
+                try:
+                    status, size = await transport.post(path, body)
+                    error = None if status < 400 else f"HTTP {status}"
+                except Exception as exc:
+                    status, size, error = 0, 0, f"{type(exc).__name__}: {exc}"
+                result.samples.append(Sample(scenario.name, schema, status, time.perf_counter() - start, size, error))
+        finally:
+            transport.close()
+
+    stop = asyncio.Event()
+    sampler = asyncio.create_task(_sample_rss(result, read_rss, rss_interval, stop)) if read_rss else None
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    result.duration = time.perf_counter() - start
+    stop.set()
+    if sampler is not None:
+        await sampler
+    return result
+
+
+def summarize(result: LoadTestResult) -> Dict:
+    """Throughput, error rate and latency percentiles overall and per scenario/schema"""
+
+    def stats(samples: List[Sample]) -> Dict:
+        latencies = [sample.latency for sample in samples]
+        errors = sum(1 for sample in samples if sample.error)
+        return {
+            "requests": len(samples),
+            "error_rate": errors / len(samples) if samples else 0.0,
+            "p50_ms": _ms(percentile(latencies, 0.50)),
+            "p95_ms": _ms(percentile(latencies, 0.95)),
+            "p99_ms": _ms(percentile(latencies, 0.99)),
+            "max_ms": _ms(max(latencies, default=None)),
+        }
+
+    groups: Dict[str, List[Sample]] = {}
+    for sample in result.samples:
+        groups.setdefault(f"{sample.scenario}/{sample.schema}", []).append(sample)
+
+    rss_values = [sample.rss_kb for sample in result.rss if sample.rss_kb is not None]
+    return {
+        "throughput_rps": len(result.samples) / result.duration if result.duration else 0.0,
+        "duration_s": result.duration,
+        "overall": stats(result.samples),
+        "by_scenario": {name: stats(samples) for name, samples in sorted(groups.items())},
+        "rss_kb": {"start": rss_values[0], "peak": max(rss_values), "end": rss_values[-1]} if rss_values else None,
+    }
+
+
+def _ms(seconds: Optional[float]) -> Optional[float]:
+    return None if seconds is None else round(seconds * 1000, 2)
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def save_result(result: LoadTestResult, output: Optional[Path]) -> Path:
+    if output is None:
+        RESULTS_DIR.mkdir(parents=True, exist_ok=True)
+        revision = result.config.get("revision") or "unknown"
+        output = RESULTS_DIR / f"{time.strftime('%Y%m%d-%H%M%S')}-{revision}.json"
+    output.write_text(json.dumps({"summary": summarize(result), **asdict(result)}, indent=2))
+    return output
+
+
+def print_summary(summary: Dict, baseline: Optional[Dict] = None) -> None:
+    def delta(key: str, current: Optional[float], previous: Dict) -> str:
+        old = previous.get(key) if previous else None
+        if current is None or not old:
+            return ""
+        return f" ({(current - old) / old * 100:+.1f}%)"
+
+    previous_overall = baseline["summary"]["overall"] if baseline else {}
+    previous_groups = baseline["summary"]["by_scenario"] if baseline else {}
+    print(f"throughput: {summary['throughput_rps']:.2f} req/s"
+          + delta("throughput_rps", summary["throughput_rps"], baseline["summary"] if baseline else {}))
+    print(f"{'scenario':<20} {'n':>6} {'err%':>6} {'p50 ms':>10} {'p95 ms':>10} {'p99 ms':>10}")
+    rows = [("overall", summary["overall"], previous_overall)]
+    rows += [(name, stats, previous_groups.get(name, {})) for name, stats in summary["by_scenario"].items()]
+    for name, stats, previous in rows:
+        print(f"{name:<20} {stats['requests']:>6} {stats['error_rate'] * 100:>5.1f}% "
+              + " ".join(f"{stats[key]!s:>10}" for key in ("p50_ms", "p95_ms", "p99_ms"))
+              + "".join(delta(key, stats[key], previous) for key in ("p50_ms", "p95_ms", "p99_ms")))
+    if summary["rss_kb"]:
+        print("worker rss kB: start {start}, peak {peak}, end {end}".format(**summary["rss_kb"]))
+
+
+def _spawn_uvicorn(port: int) -> subprocess.Popen:
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"])
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError("uvicorn exited during startup (is it installed?)")
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            connection.request("GET", "/")
+            connection.getresponse().read()
+            return server
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError("uvicorn did not start within 30s")
+
+
+def main(argv: Optional[List[str]] = None) -> Dict:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--url", help="base URL of a running server (default: in-process ASGI)")
+    target.add_argument("--spawn-uvicorn", action="store_true", help="start uvicorn main:app locally")
+    parser.add_argument("--port", type=int, default=8765, help="port for --spawn-uvicorn")
+    parser.add_argument("--pid", type=int, help="server process to sample RSS from with --url (default: none)")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--mix", default="single=8,bulk=2", help=f"weights per scenario ({', '.join(SCENARIOS)})")
+    parser.add_argument("--schemas", default="IFC4", help="comma separated schemas to spread requests over")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--rss-interval", type=float, default=0.5, help="seconds between RSS samples")
+    parser.add_argument("--output", type=Path, help=f"result file (default: {RESULTS_DIR}/<time>-<rev>.json)")
+    parser.add_argument("--compare", type=Path, help="earlier result file to print deltas against")
+    args = parser.parse_args(argv)
+
+    schemas = [schema.strip().upper() for schema in args.schemas.split(",")]
+    plan = plan_requests(parse_mix(args.mix), schemas, args.requests, args.seed)
+    config = {key: value for key, value in vars(args).items() if key not in ("output", "compare")}
+    config["revision"] = _git_revision()
+
+    server = None
+    if args.spawn_uvicorn:
+        server = _spawn_uvicorn(args.port)
+        base_url, rss_pid = f"http://127.0.0.1:{args.port}", server.pid
+    else:
+        base_url, rss_pid = args.url, args.pid
+
+    try:
+        if base_url:
+            factory = lambda: HttpTransport(base_url)
+            read_rss = (lambda: read_rss_kb(rss_pid)) if rss_pid else None
+        else:
+            from main import app
+            factory, read_rss = (lambda: AsgiTransport(app)), read_rss_kb
+        result = asyncio.run(run_load_test(factory, plan, args.concurrency, config, read_rss, args.rss_interval))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    path = save_result(result, args.output)
+    baseline = json.loads(args.compare.read_text()) if args.compare else None
+    summary = summarize(result)
+    print_summary(summary, baseline)
+    print(f"results written to {path}")
+    return summary
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,171 @@
+import contextlib
+import contextvars
+import functools
+import itertools
+import json
+import logging
+import os
+import reprlib
+import sys
+import time
+from typing import Any, Callable, Dict, Iterator, Optional, TextIO
+
+# Fields bound for the current request or build, e.g. request_id, schema, element_count
+_context: contextvars.ContextVar[Dict[str, Any]] = contextvars.ContextVar("log_context", default={})
+
+_repr = reprlib.Repr()
+_repr.maxstring = 200
+_repr.maxother = 200
+
+
+@contextlib.contextmanager
+def log_context(**fields) -> Iterator[None]:
+    """Attach ``fields`` to every event logged in this block, including from threads started
+    with asyncio.to_thread and tasks created inside it"""
+    previous = _context.get()
+    _context.set({**previous, **fields})
+    try:
+        yield
+    finally:
+        # Not reset(token): the block may end in another task's context than it began in, e.g.
+        # an admission released by a streaming response
+        _context.set(previous)
+
+
+def _plain(value: Any) -> Any:
+    """JSON-friendly form of a field value; anything but scalars becomes a bounded repr"""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    return _repr.repr(value)
+
+
+class Event:
+    """Log message of a structured event; fields are only formatted if a handler emits it"""
+    __slots__ = ("name", "fields", "context")
+
+    def __init__(self, name: str, fields: Dict[str, Any], context: Dict[str, Any]):
+        self.name = name
+        self.fields = fields
+        self.context = context
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"event": self.name, **{key: _plain(value) for key, value in {**self.context, **self.fields}.items()}}
+
+    def __str__(self) -> str:
+        pairs = (f"{key}={_plain(value)}" for key, value in {**self.context, **self.fields}.items())
+        return " ".join((self.name, *pairs))
+
+
+class StructuredLogger:
+    """Logs named events with keyword fields through a stdlib logger.
+
+    The level is checked before anything else, so a disabled call costs one dict lookup.
+    ``sample=n`` keeps the first and then every n-th occurrence of a high-frequency event;
+    kept events carry ``sample_rate`` so counts can be scaled back up.
+    """
+    __slots__ = ("_logger", "_counters")
+
+    def __init__(self, name: str):
+        self._logger = logging.getLogger(name)
+        self._counters: Dict[str, Iterator[int]] = {}
+
+    def enabled_for(self, level: int) -> bool:
+        return self._logger.isEnabledFor(level)
+
+    def log(self, level: int, event: str, /, sample: int = 1, **fields) -> None:
+        if self._logger.isEnabledFor(level):
+            self._emit(level, event, sample, fields)
+
+    # The level check is repeated in each method so a disabled call does not pass its fields on
+    def debug(self, event: str, /, sample: int = 1, **fields) -> None:
+        if self._logger.isEnabledFor(logging.DEBUG):
+            self._emit(logging.DEBUG, event, sample, fields)
+
+    def info(self, event: str, /, sample: int = 1, **fields) -> None:
+        if self._logger.isEnabledFor(logging.INFO):
+            self._emit(logging.INFO, event, sample, fields)
+
+    def warning(self, event: str, /, sample: int = 1, **fields) -> None:
+        if self._logger.isEnabledFor(logging.WARNING):
+            self._emit(logging.WARNING, event, sample, fields)
+
+    def error(self, event: str, /, sample: int = 1, **fields) -> None:
+        if self._logger.isEnabledFor(logging.ERROR):
+            self._emit(logging.ERROR, event, sample, fields)
+
+    def _emit(self, level: int, event: str, sample: int, fields: Dict[str, Any]) -> None:
+        if sample > 1:
+            counter = self._counters.get(event)
+            if counter is None:
+                counter = self._counters.setdefault(event, itertools.count())
+            if next(counter) % sample:
+                return
+            fields["sample_rate"] = sample
+        self._logger.log(level, Event(event, fields, _context.get()))
+
+
+@functools.lru_cache(maxsize=None)
+def get_logger(name: str) -> StructuredLogger:
+    return StructuredLogger(name)
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, event, context and fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+        }
+        if isinstance(record.msg, Event):
+            entry.update(record.msg.as_dict())
+        else:
+            entry["message"] = record.getMessage()
+            entry.update({key: _plain(value) for key, value in _context.get().items()})
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry)
+
+
+def configure_logging(level: Optional[str] = None, stream: Optional[TextIO] = None) -> None:
+    """Log JSON lines to ``stream`` (stderr) at ``level``, configured by IFC_LOG_LEVEL (INFO).
+
+    Called by the application on startup; does nothing if the root logger already has a
+    handler, so a host process' logging setup wins.
+    """
+    root = logging.getLogger()
+    if root.handlers:
+        return
+    handler = logging.StreamHandler(stream or sys.stderr)
+    handler.setFormatter(JsonFormatter())
+    root.addHandler(handler)
+    root.setLevel((level or os.environ.get("IFC_LOG_LEVEL", "INFO")).upper())
+
+
+def logged(func: Optional[Callable] = None, *, level: int = logging.DEBUG, sample: int = 1):
+    """Log calls of the decorated function with their arguments, result and duration.
+
+    Arguments and result are only formatted when the event is emitted; with the level
+    disabled the wrapper adds a single level check. ``sample`` counts the calls of each
+    decorated function on their own.
+    """
+    def decorate(func: Callable) -> Callable:
+        log = get_logger(func.__module__)
+        name = func.__qualname__
+        calls = itertools.count()
+        sampled = {"sample_rate": sample} if sample > 1 else {}
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not log.enabled_for(level) or next(calls) % sample:
+                return func(*args, **kwargs)
+            start = time.perf_counter()
+            result = func(*args, **kwargs)
+            log.log(level, "call", function=name, args=args, kwargs=kwargs, result=result,
+                    seconds=time.perf_counter() - start, **sampled)
+            return result
+
+        return wrapper
+
+    return decorate(func) if func is not None else decorate
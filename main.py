@@ -1,6 +1,74 @@
-from fastapi import FastAPI
+import contextlib
+import dataclasses
+import math
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
 from api.v1 import ifc_routes
-app = FastAPI(title="IFC Creator API")
+from core.structured_log import configure_logging, get_logger, log_context
+from services import model_partitioner
+from services.admission import AdmissionRejected, RequestTooLarge
+
+log = get_logger(__name__)
+
+
+@contextlib.asynccontextmanager
+async def lifespan(app: FastAPI):
+    configure_logging()
+    yield
+    model_partitioner.shutdown_workers()
+
+
+app = FastAPI(title="IFC Creator API", lifespan=lifespan)
+
+
+class RequestContextMiddleware:
+    """Tag everything logged for a request with its id, taken from X-Request-ID if the client sent one.
+
+    A plain ASGI middleware rather than @app.middleware("http"): that one is done once the
+    response object is returned, before a streamed body is sent. ``request.finished`` is
+    logged with the last body chunk instead, and ``request.aborted`` if the response never
+    completed, e.g. because the client disconnected.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request_id = Headers(scope=scope).get("x-request-id") or uuid.uuid4().hex
+        start = time.perf_counter()
+        status = None
+        finished = False
+
+        async def send_with_request_id(message: Message) -> None:
+            nonlocal status, finished
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                MutableHeaders(scope=message)["X-Request-ID"] = request_id
+            await send(message)
+            if message["type"] == "http.response.body" and not message.get("more_body", False):
+                finished = True
+                log.info("request.finished", method=scope["method"], path=scope["path"], status=status,
+                         seconds=time.perf_counter() - start)
+
+        with log_context(request_id=request_id):
+            try:
+                await self.app(scope, receive, send_with_request_id)
+            finally:
+                if not finished:
+                    log.warning("request.aborted", method=scope["method"], path=scope["path"], status=status,
+                                seconds=time.perf_counter() - start)
+
+
+app.add_middleware(RequestContextMiddleware)
 
 
 @app.get("/")
@@ -14,3 +82,14 @@ async def say_hello(name: str):
 
 
 app.include_router(ifc_routes.router, prefix="/api/v1")
+
+
+@app.exception_handler(RequestTooLarge)
+async def request_too_large(request: Request, exc: RequestTooLarge):
+    return JSONResponse(status_code=413, content={"detail": str(exc), "estimate": dataclasses.asdict(exc.estimate)})
+
+
+@app.exception_handler(AdmissionRejected)
+async def admission_rejected(request: Request, exc: AdmissionRejected):
+    return JSONResponse(status_code=429, content={"detail": str(exc), "estimate": dataclasses.asdict(exc.estimate)},
+                        headers={"Retry-After": str(max(1, math.ceil(exc.estimate.seconds)))})
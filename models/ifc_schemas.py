@@ -1,5 +1,5 @@
 # models/ifc_schemas.py
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List
 
 
@@ -14,3 +14,18 @@ class IfcBeamCreateRequest(BaseModel):
     length: float
     width: float
     height: float
+
+
+class IfcBeamRow(BaseModel):
+    """One beam of an uploaded member list (CSV header / NDJSON keys match the field names)"""
+    name: str
+    length: float = Field(gt=0)
+    width: float = Field(gt=0)
+    height: float = Field(gt=0)
+    x: float = 0.0
+    y: float = 0.0
+    z: float = 0.0
+
+
+class IfcBeamsCreateRequest(BaseModel):
+    beams: List[IfcBeamRow]
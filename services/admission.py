@@ -0,0 +1,390 @@
+import asyncio
+import contextlib
+import ctypes
+import json
+import math
+import multiprocessing
+import os
+import resource
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import AsyncIterator, Deque, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from core.structured_log import get_logger, log_context
+
+log = get_logger(__name__)
+
+
+@dataclass(frozen=True, slots=True)
+class CostEstimate:
+    entities: Optional[int]
+    # None for a measured build whose memory could not be attributed to it alone
+    memory_bytes: Optional[int]
+    seconds: float
+
+
+@dataclass(slots=True)
+class LinearCost:
+    """cost = base + per_element * element_count"""
+    base: float
+    per_element: float
+
+    def __call__(self, element_count: int) -> float:
+        return self.base + self.per_element * element_count
+
+    @classmethod
+    def fit(cls, points: Sequence[Tuple[int, float]]) -> 'LinearCost':
+        """Least squares fit through (element_count, cost) points"""
+        if not points:
+            raise ValueError("At least one point is required")
+        n = len(points)
+        mean_x = sum(x for x, _ in points) / n
+        mean_y = sum(y for _, y in points) / n
+        variance = sum((x - mean_x) ** 2 for x, _ in points)
+        if variance == 0:
+            return cls(base=mean_y, per_element=mean_y / mean_x if mean_x else 0.0)
+        slope = sum((x - mean_x) * (y - mean_y) for x, y in points) / variance
+        return cls(base=max(mean_y - slope * mean_x, 0.0), per_element=max(slope, 0.0))
+
+
+@dataclass(slots=True)
+class SchemaCost:
+    entities: LinearCost
+    memory_bytes: LinearCost
+    seconds: LinearCost
+
+
+@dataclass(slots=True)
+class CostRecord:
+    """Estimated vs. measured cost of one build"""
+    schema: str
+    element_count: int
+    estimate: CostEstimate
+    actual: CostEstimate
+
+
+class CostModel:
+    """Estimates entity count, memory and build time of a model from its request shape"""
+
+    def __init__(self, schemas: Dict[str, SchemaCost]):
+        self.schemas = schemas
+
+    def estimate(self, element_count: int, schema: str) -> CostEstimate:
+        try:
+            cost = self.schemas[schema.upper()]
+        except KeyError:
+            raise ValueError(f"Unsupported schema version: {schema}") from None
+        return CostEstimate(
+            entities=math.ceil(cost.entities(element_count)),
+            memory_bytes=math.ceil(cost.memory_bytes(element_count)),
+            seconds=cost.seconds(element_count),
+        )
+
+    @classmethod
+    def fit(cls, records: Iterable[CostRecord], fallback: Optional['CostModel'] = None) -> 'CostModel':
+        """Fit a model to measured builds, e.g. calibrate() output or AdmissionController.records.
+
+        Costs without measurements (no records for a schema, or unknown entity counts) are
+        taken from ``fallback``, which defaults to DEFAULT_COST_MODEL.
+        """
+        fallback = fallback or DEFAULT_COST_MODEL
+        by_schema: Dict[str, List[CostRecord]] = {}
+        for record in records:
+            by_schema.setdefault(record.schema.upper(), []).append(record)
+
+        schemas = dict(fallback.schemas)
+        for schema, schema_records in by_schema.items():
+            costs = {}
+            for name in ("entities", "memory_bytes", "seconds"):
+                points = [(record.element_count, getattr(record.actual, name)) for record in schema_records
+                          if getattr(record.actual, name) is not None]
+                costs[name] = LinearCost.fit(points) if points else getattr(fallback.schemas[schema], name)
+            schemas[schema] = SchemaCost(**costs)
+        return cls(schemas)
+
+    def to_dict(self) -> Dict:
+        return {schema: asdict(cost) for schema, cost in self.schemas.items()}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'CostModel':
+        return cls({schema: SchemaCost(**{name: LinearCost(**value) for name, value in cost.items()})
+                    for schema, cost in data.items()})
+
+    def save(self, path: Path) -> None:
+        Path(path).write_text(json.dumps(self.to_dict(), indent=2))
+
+    @classmethod
+    def load(cls, path: Path) -> 'CostModel':
+        return cls.from_dict(json.loads(Path(path).read_text()))
+
+
+# Fitted with benchmarks/calibrate_cost_model.py (beam builds of 0..4000 elements, one process each).
+# Memory is the peak RSS growth of the build, which includes ifcopenshell's native allocations.
+DEFAULT_COST_MODEL = CostModel.from_dict({
+    "IFC2X3": {"entities": {"base": 31.0, "per_element": 19.0},
+               "memory_bytes": {"base": 1_600_000.0, "per_element": 9_600.0},
+               "seconds": {"base": 0.002, "per_element": 0.00040}},
+    "IFC4": {"entities": {"base": 26.0, "per_element": 19.0},
+             "memory_bytes": {"base": 1_750_000.0, "per_element": 9_700.0},
+             "seconds": {"base": 0.002, "per_element": 0.00037}},
+    "IFC4X3": {"entities": {"base": 26.0, "per_element": 19.0},
+               "memory_bytes": {"base": 1_750_000.0, "per_element": 9_750.0},
+               "seconds": {"base": 0.002, "per_element": 0.00034}},
+})
+
+
+# Interval at which the resident memory of an admitted build is sampled
+RSS_SAMPLE_INTERVAL = 0.01
+
+
+def _peak_rss_bytes() -> int:
+    # ru_maxrss is in kB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def _current_rss_bytes() -> Optional[int]:
+    """Resident set size right now; None where /proc is not available"""
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+def _release_free_memory() -> None:
+    """Hand memory freed by earlier builds back to the OS (glibc only), so that the next
+    build's RSS growth is not hidden by reused heap pages"""
+    try:
+        ctypes.CDLL(None).malloc_trim(0)
+    except (OSError, AttributeError):
+        pass
+
+
+class _RssSampler:
+    """Peak growth of the resident set size from now on, sampled by a background thread.
+
+    ru_maxrss cannot be used for this: it is the process' high-water mark, so every build
+    smaller than an earlier one would measure 0.
+    """
+
+    def __init__(self, interval: float = RSS_SAMPLE_INTERVAL):
+        _release_free_memory()
+        self._start = _current_rss_bytes()
+        self._peak = self._start
+        self._stop = threading.Event()
+        if self._start is not None:
+            threading.Thread(target=self._sample, args=(interval,), name="rss-sampler", daemon=True).start()
+
+    def _sample(self, interval: float) -> None:
+        while not self._stop.wait(interval):
+            self._peak = max(self._peak, _current_rss_bytes() or 0)
+
+    def stop(self) -> Optional[int]:
+        self._stop.set()
+        if self._start is None:
+            return None
+        return max(self._peak, _current_rss_bytes() or 0) - self._start
+
+
+def _measure_build(schema: str, element_count: int) -> CostEstimate:
+    """Build ``element_count`` beams and measure them; meant to run in a fresh process"""
+    from models.ifc_schemas import IfcBeamRow
+    from services.build_progress import BuildProgress
+    from services.ifc_model_manager_factory import create_ifc_beams_file
+
+    rows = [IfcBeamRow(name=f"Beam{i}", length=3.0, width=0.2, height=0.4, x=float(i)) for i in range(element_count)]
+    progress = BuildProgress(element_count)
+    baseline = _peak_rss_bytes()
+    start = time.perf_counter()
+    path = create_ifc_beams_file(rows, schema, progress)
+    seconds = time.perf_counter() - start
+    os.remove(path)
+    # Peak RSS covers the Python heap as well as ifcopenshell's native allocations, which
+    # tracemalloc does not see
+    return CostEstimate(entities=progress.entities, memory_bytes=_peak_rss_bytes() - baseline, seconds=seconds)
+
+
+def calibrate(schemas: Iterable[str] = ("IFC2X3", "IFC4", "IFC4X3"),
+              element_counts: Iterable[int] = (0, 500, 1000, 2000, 4000),
+              model: Optional['CostModel'] = None) -> List[CostRecord]:
+    """Measure real IfcModelManager builds, each in a fresh process so peak RSS is its own"""
+    model = model or DEFAULT_COST_MODEL
+    context = multiprocessing.get_context("spawn")
+    records = []
+    with context.Pool(processes=1, maxtasksperchild=1) as pool:
+        for schema in schemas:
+            for element_count in element_counts:
+                actual = pool.apply(_measure_build, (schema, element_count))
+                records.append(CostRecord(schema, element_count, model.estimate(element_count, schema), actual))
+    return records
+
+
+class AdmissionError(Exception):
+    def __init__(self, message: str, estimate: CostEstimate):
+        super().__init__(message)
+        self.estimate = estimate
+
+
+class RequestTooLarge(AdmissionError):
+    """The request alone exceeds the memory budget"""
+
+
+class AdmissionRejected(AdmissionError):
+    """The budget is taken and the request could not be queued or waited too long"""
+
+
+@dataclass(slots=True)
+class AdmissionTicket:
+    schema: str
+    element_count: int
+    estimate: CostEstimate
+    entities: Optional[int] = None
+    _start: float = field(default_factory=time.perf_counter)
+    # Only sampled for builds that start while no other build runs
+    _rss: Optional[_RssSampler] = None
+    # Index of the build among all admitted ones, to tell whether another one overlapped it
+    _index: int = 0
+
+
+class AdmissionController:
+    """Admits model builds while their estimated memory fits the budget, queueing the rest.
+
+    Callers fill in ``ticket.entities`` once the build is done; estimated and actual cost
+    of every admitted build is kept in ``records`` for recalibration (see CostModel.fit).
+    Actual memory is the peak growth of the process' resident set size during the build.
+    It is only attributable to a build that no other build overlapped, and recorded as
+    None otherwise, so CostModel.fit skips it.
+    """
+
+    def __init__(self, cost_model: CostModel, memory_budget_bytes: int, max_queue: int = 64,
+                 queue_timeout: float = 30.0, history: int = 1000):
+        self.cost_model = cost_model
+        self.memory_budget_bytes = memory_budget_bytes
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.records: Deque[CostRecord] = deque(maxlen=history)
+        self.reserved_bytes = 0
+        self.queued = 0
+        self._condition = asyncio.Condition()
+        self._running = 0
+        self._admitted = 0
+
+    @classmethod
+    def from_environment(cls) -> 'AdmissionController':
+        """Configured by IFC_MEMORY_BUDGET_MB, IFC_ADMISSION_MAX_QUEUE, IFC_ADMISSION_QUEUE_TIMEOUT, IFC_COST_MODEL"""
+        cost_model_path = os.environ.get("IFC_COST_MODEL")
+        return cls(
+            cost_model=CostModel.load(Path(cost_model_path)) if cost_model_path else DEFAULT_COST_MODEL,
+            memory_budget_bytes=int(float(os.environ.get("IFC_MEMORY_BUDGET_MB", "1024")) * 1024 * 1024),
+            max_queue=int(os.environ.get("IFC_ADMISSION_MAX_QUEUE", "64")),
+            queue_timeout=float(os.environ.get("IFC_ADMISSION_QUEUE_TIMEOUT", "30")),
+        )
+
+    def estimate(self, element_count: Optional[int], *schemas: str) -> CostEstimate:
+        """Estimate for ``element_count`` elements built in each of ``schemas`` side by side;
+        None (unknown size) reserves the whole budget"""
+        if not schemas:
+            raise ValueError("At least one schema is required")
+        estimates = [self.cost_model.estimate(element_count or 0, schema) for schema in schemas]
+        memory_bytes = sum(estimate.memory_bytes for estimate in estimates)
+        return CostEstimate(
+            entities=sum(estimate.entities for estimate in estimates),
+            memory_bytes=self.memory_budget_bytes if element_count is None else memory_bytes,
+            seconds=max(estimate.seconds for estimate in estimates),
+        )
+
+    def check(self, element_count: Optional[int], *schemas: str) -> CostEstimate:
+        """Estimate of the request; RequestTooLarge if it could never be admitted.
+
+        Lets callers refuse such requests before they wait for anything else.
+        """
+        estimate = self.estimate(element_count, *schemas)
+        if estimate.memory_bytes > self.memory_budget_bytes:
+            log.warning("admission.too_large", schemas=schemas, elements=element_count,
+                        memory_bytes=estimate.memory_bytes)
+            raise RequestTooLarge(f"Estimated {estimate.memory_bytes} bytes exceed the memory budget of "
+                                  f"{self.memory_budget_bytes} bytes", estimate)
+        return estimate
+
+    @contextlib.asynccontextmanager
+    async def admit(self, element_count: Optional[int], *schemas: str) -> AsyncIterator[AdmissionTicket]:
+        """Reserve the estimated memory of building ``element_count`` elements in ``schemas``.
+
+        Builds of several schemas (see services.schema_fan_out) are admitted as one and not
+        recorded, since their measured cost is not attributable to a single schema. The schema
+        and element count are attached to everything logged inside the block.
+        """
+        estimate = self.check(element_count, *schemas)
+        async with self._condition:
+            if not self._fits(estimate):
+                if self.queued >= self.max_queue:
+                    log.warning("admission.rejected", reason="queue_full", schemas=schemas, elements=element_count)
+                    raise AdmissionRejected("Too many requests waiting for memory", estimate)
+                self.queued += 1
+                try:
+                    await asyncio.wait_for(self._condition.wait_for(lambda: self._fits(estimate)),
+                                           self.queue_timeout)
+                except asyncio.TimeoutError:
+                    log.warning("admission.rejected", reason="timeout", schemas=schemas, elements=element_count)
+                    raise AdmissionRejected(f"No memory became available within {self.queue_timeout}s",
+                                            estimate) from None
+                finally:
+                    self.queued -= 1
+            self.reserved_bytes += estimate.memory_bytes
+
+        ticket = AdmissionTicket("+".join(schema.upper() for schema in schemas), element_count or 0, estimate,
+                                 _rss=_RssSampler() if self._running == 0 else None, _index=self._admitted)
+        self._running += 1
+        self._admitted += 1
+        try:
+            with log_context(schema=ticket.schema, element_count=element_count):
+                yield ticket
+        finally:
+            self._running -= 1
+            memory_bytes = ticket._rss.stop() if ticket._rss is not None else None
+            if self._admitted != ticket._index + 1:
+                # Another build started while this one ran
+                memory_bytes = None
+            actual = CostEstimate(
+                entities=ticket.entities,
+                memory_bytes=memory_bytes,
+                seconds=time.perf_counter() - ticket._start,
+            )
+            estimate = ticket.estimate
+            log.info("build.finished", schema=ticket.schema, element_count=ticket.element_count,
+                     entities=actual.entities, estimated_entities=estimate.entities,
+                     memory_bytes=actual.memory_bytes, estimated_memory_bytes=estimate.memory_bytes,
+                     seconds=actual.seconds, estimated_seconds=estimate.seconds)
+            if len(schemas) == 1:
+                self.records.append(CostRecord(ticket.schema, ticket.element_count, estimate, actual))
+            async with self._condition:
+                self.reserved_bytes -= estimate.memory_bytes
+                self._condition.notify_all()
+
+    async def resize(self, ticket: AdmissionTicket, element_count: int) -> None:
+        """Re-estimate an admitted build once its real size is known, e.g. an upload whose row
+        count was guessed from its length.
+
+        The reservation shrinks or grows without waiting, since the memory is already in use;
+        a build grown past the budget only holds back the next admissions.
+        """
+        estimate = self.estimate(element_count, *ticket.schema.split("+"))
+        async with self._condition:
+            self.reserved_bytes += estimate.memory_bytes - ticket.estimate.memory_bytes
+            self._condition.notify_all()
+        ticket.element_count = element_count
+        ticket.estimate = estimate
+
+    def _fits(self, estimate: CostEstimate) -> bool:
+        return self.reserved_bytes + estimate.memory_bytes <= self.memory_budget_bytes
+
+    def stats(self) -> Dict:
+        return {
+            "memory_budget_bytes": self.memory_budget_bytes,
+            "reserved_bytes": self.reserved_bytes,
+            "queued": self.queued,
+            "records": [asdict(record) for record in self.records],
+        }
@@ -0,0 +1,104 @@
+import asyncio
+import os
+from enum import Enum
+from typing import AsyncIterator, Callable, Dict, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class BuildStage(str, Enum):
+    PENDING = "pending"
+    SKELETON = "skeleton"
+    ELEMENTS = "elements"
+    RELATIONS = "relations"
+    COMPACTION = "compaction"
+    SERIALIZATION = "serialization"
+
+
+class BuildProgress:
+    """Counters IfcModelManager updates while it builds.
+
+    The builder only assigns attributes; nothing is formatted or sent from the creator
+    loop. Consumers sample ``snapshot()`` at their own rate (see stream_build_progress).
+    """
+    __slots__ = ("stage", "elements_created", "elements_total", "entities", "bytes_written", "output_path")
+
+    def __init__(self, elements_total: Optional[int] = None):
+        self.stage = BuildStage.PENDING
+        self.elements_created = 0
+        self.elements_total = elements_total
+        self.entities = 0
+        self.bytes_written = 0
+        self.output_path: Optional[str] = None
+
+    def element_added(self) -> None:
+        self.stage = BuildStage.ELEMENTS
+        self.elements_created += 1
+
+    def snapshot(self) -> Dict:
+        bytes_written = self.bytes_written
+        if self.stage is BuildStage.SERIALIZATION and not bytes_written and self.output_path:
+            # ifcopenshell writes the file in one native call, so watch it grow on disk
+            try:
+                bytes_written = os.path.getsize(self.output_path)
+            except OSError:
+                pass
+        return {
+            "event": "progress",
+            "stage": self.stage.value,
+            "elements_created": self.elements_created,
+            "elements_total": self.elements_total,
+            "bytes_written": bytes_written,
+        }
+
+
+async def wait_for_build(task: asyncio.Future) -> None:
+    """Wait for ``task`` to finish, holding back any cancellation of the caller until it has"""
+    cancelled = False
+    while not task.done():
+        try:
+            await asyncio.wait({task})
+        except asyncio.CancelledError:
+            cancelled = True
+    if cancelled:
+        raise asyncio.CancelledError
+
+
+async def run_to_completion(func: Callable[..., T], *args, **kwargs) -> T:
+    """Run the blocking ``func`` in a worker thread. A thread cannot be stopped, so if the
+    caller is cancelled, the cancellation is held back until ``func`` returns: admission
+    and build slots held by the caller keep covering it."""
+    task = asyncio.ensure_future(asyncio.to_thread(func, *args, **kwargs))
+    await wait_for_build(task)
+    return task.result()
+
+
+async def stream_build_progress(build: Callable[[BuildProgress], str], progress: BuildProgress,
+                                interval: float = 0.25) -> AsyncIterator[Dict]:
+    """Run ``build`` in a worker thread and yield a progress event at most every ``interval`` seconds.
+
+    Unchanged snapshots are skipped. The last event is ``complete`` with the written file
+    path, or ``error`` if the build raised. If the consumer stops early, e.g. because the
+    client disconnected, the generator still only finishes once the build has: a thread
+    cannot be stopped, and the caller's admission and build slot must cover it until it ends.
+    """
+    task = asyncio.ensure_future(asyncio.to_thread(build, progress))
+    try:
+        last = None
+        done = False
+        while not done:
+            finished, _ = await asyncio.wait({task}, timeout=interval)
+            done = bool(finished)
+            snapshot = progress.snapshot()
+            if snapshot != last:
+                last = snapshot
+                yield snapshot
+    finally:
+        await wait_for_build(task)
+
+    try:
+        path = task.result()
+    except Exception as exc:
+        yield {"event": "error", "detail": str(exc)}
+    else:
+        yield {"event": "complete", "path": path}
@@ -0,0 +1,180 @@
+import asyncio
+import codecs
+import csv
+import json
+import queue
+from dataclasses import dataclass, field
+from typing import AsyncIterable, AsyncIterator, Callable, Dict, List
+
+from pydantic import ValidationError
+
+from models.ifc_schemas import IfcBeamRow
+from services.build_progress import wait_for_build
+from services.ifc_model_manager import IfcModelManager
+from services.ifc_model_manager_factory import beam_dto_from_row
+from services.strategies.beam_creator import IfcBeamCreator
+
+CSV_MEDIA_TYPE = "text/csv"
+NDJSON_MEDIA_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+SUPPORTED_MEDIA_TYPES = (CSV_MEDIA_TYPE,) + NDJSON_MEDIA_TYPES
+
+# Typical row size, to guess the row count of an upload from its length: exported member lists
+# with three-decimal dimensions and coordinates run at 31-39 bytes per CSV row and 93-101 per
+# NDJSON row. Slightly low, so the guess errs towards more rows.
+TYPICAL_ROW_BYTES = {CSV_MEDIA_TYPE: 32, **dict.fromkeys(NDJSON_MEDIA_TYPES, 90)}
+
+# A single row never legitimately gets this long; refuse instead of buffering without bound
+MAX_LINE_LENGTH = 64 * 1024
+
+# Valid rows are handed to the builder thread in batches; at most MAX_PENDING_BATCHES wait
+# for it, so a fast upload of a large list is held back instead of buffered
+ROW_BATCH_SIZE = 256
+MAX_PENDING_BATCHES = 8
+
+
+@dataclass(slots=True)
+class RowError:
+    row: int
+    message: str
+
+
+@dataclass(slots=True)
+class IngestReport:
+    """Outcome of an upload; only the first ``max_errors`` row errors are kept"""
+    rows: int = 0
+    created: int = 0
+    error_count: int = 0
+    errors: List[RowError] = field(default_factory=list)
+    max_errors: int = 100
+
+    def add_error(self, row: int, message: str) -> None:
+        self.error_count += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append(RowError(row, message))
+
+
+async def iter_lines(chunks: AsyncIterable[bytes], encoding: str = "utf-8-sig",
+                     max_line_length: int = MAX_LINE_LENGTH) -> AsyncIterator[str]:
+    """Split a byte stream into text lines, holding at most one chunk plus one partial line.
+
+    The default encoding drops a leading UTF-8 byte order mark, as written by Excel.
+    """
+    decoder = codecs.getincrementaldecoder(encoding)(errors="replace")
+    pending = ""
+    async for chunk in chunks:
+        pending += decoder.decode(chunk)
+        if "\n" in pending:
+            *lines, pending = pending.split("\n")
+            for line in lines:
+                yield line.rstrip("\r")
+        if len(pending) > max_line_length:
+            raise ValueError(f"Line exceeds {max_line_length} characters")
+
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending.rstrip("\r")
+
+
+class _CsvRowDecoder:
+    """Decode CSV lines against the header row; quoted fields must not span lines"""
+
+    def __init__(self, header_line: str):
+        self._header = [name.strip() for name in next(csv.reader([header_line]))]
+
+    def __call__(self, line: str) -> Dict[str, str]:
+        values = next(csv.reader([line]))
+        if len(values) != len(self._header):
+            raise ValueError(f"Expected {len(self._header)} columns, got {len(values)}")
+        # Empty cells fall back to the row model's defaults
+        return {name: value for name, value in zip(self._header, values) if value != ""}
+
+
+def _decode_ndjson(line: str) -> Dict:
+    record = json.loads(line)
+    if not isinstance(record, dict):
+        raise ValueError(f"Expected a JSON object, got {type(record).__name__}")
+    return record
+
+
+def _format_error(exc: ValueError) -> str:
+    if isinstance(exc, ValidationError):
+        return "; ".join(f"{'.'.join(map(str, error['loc'])) or 'row'}: {error['msg']}"
+                         for error in exc.errors())
+    return str(exc)
+
+
+def _add_beams(manager: IfcModelManager, batches: queue.Queue) -> None:
+    """Builder thread: add the rows of every queued batch until the None sentinel"""
+    try:
+        while (batch := batches.get()) is not None:
+            for row in batch:
+                manager.add_building_element(IfcBeamCreator(beam_dto_from_row(row)))
+    except BaseException:
+        # Keep taking batches so the parser never waits on a full queue
+        while batches.get() is not None:
+            pass
+        raise
+
+
+async def _put(batches: queue.Queue, item) -> None:
+    try:
+        batches.put_nowait(item)
+    except queue.Full:
+        await asyncio.to_thread(batches.put, item)
+
+
+async def _finish(batches: queue.Queue, builder: asyncio.Future) -> None:
+    await _put(batches, None)
+    await builder
+
+
+async def ingest_beams(manager: IfcModelManager, chunks: AsyncIterable[bytes], media_type: str,
+                       max_errors: int = 100) -> IngestReport:
+    """Parse a CSV or NDJSON member list chunk by chunk and add each valid row as a beam.
+
+    Parsing and validation run on the event loop; the beams are created by a worker thread
+    that owns ``manager`` until this returns. Invalid rows are recorded in the report and
+    skipped. ``manager`` must be initialized.
+    """
+    if media_type not in SUPPORTED_MEDIA_TYPES:
+        raise ValueError(f"Unsupported media type: {media_type}")
+
+    report = IngestReport(max_errors=max_errors)
+    decode: Callable[[str], Dict] = None if media_type == CSV_MEDIA_TYPE else _decode_ndjson
+    batches: queue.Queue = queue.Queue(maxsize=MAX_PENDING_BATCHES)
+    builder = asyncio.ensure_future(asyncio.to_thread(_add_beams, manager, batches))
+
+    batch: List[IfcBeamRow] = []
+    line_number = 0
+    try:
+        async for line in iter_lines(chunks):
+            line_number += 1
+            if not line.strip():
+                continue
+            if decode is None:
+                decode = _CsvRowDecoder(line)
+                continue
+
+            report.rows += 1
+            try:
+                row = IfcBeamRow.model_validate(decode(line))
+            except ValueError as exc:
+                report.add_error(line_number, _format_error(exc))
+                continue
+
+            batch.append(row)
+            report.created += 1
+            if len(batch) >= ROW_BATCH_SIZE:
+                await _put(batches, batch)
+                batch = []
+        if batch:
+            await _put(batches, batch)
+    finally:
+        # The builder finishes even if parsing failed or the request was cancelled, so the
+        # manager is never used by two threads at once, and a cancellation is held back until
+        # it has: the caller's build slot and admission must cover the thread until it ends
+        finishing = asyncio.ensure_future(_finish(batches, builder))
+        await wait_for_build(finishing)
+        finishing.result()
+
+    return report
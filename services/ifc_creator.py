@@ -1,10 +1,10 @@
 import uuid
-from pathlib import Path
 
 import ifcopenshell
 import ifcopenshell.api
 
 from models.ifc_schemas import IfcBeamCreateRequest
+from services.ifc_model_manager import OUTPUT_DIR
 
 class IfcModel:
     def __init__(self, ifc_file_path: str):
@@ -16,9 +16,8 @@ class IfcModel:
 
 
 def create_ifc_file_path() -> str:
-    output_dir = Path("generated")
-    output_dir.mkdir(exist_ok=True)
-    output_path = output_dir / f"{uuid.uuid4()}.ifc"
+    OUTPUT_DIR.mkdir(exist_ok=True)
+    output_path = OUTPUT_DIR / f"{uuid.uuid4()}.ifc"
     return str(output_path)
 
 
@@ -183,7 +182,6 @@ def def_create_owner_history(ifc):
     organization = ifc.create_entity("IfcOrganization", Identification="", Name="Brunner246", Description="Brunner246")
     person_and_organization = ifc.create_entity("IfcPersonAndOrganization", ThePerson=person,
                                                 TheOrganization=organization)
-    organization = ifc.create_entity("IfcOrganization", Name="Brunner246")
     owning_application = ifc.create_entity("IfcApplication", ApplicationDeveloper=organization, Version="0.1.0",
                                            ApplicationFullName="IfcCreator", ApplicationIdentifier="ABC123")
     creation_date = ifc.create_entity("IfcTimeStamp", creation_date_time)
@@ -1,8 +1,11 @@
 # services/ifc_model_manager.py
 
+import json
+import os
 import time
 import uuid
 from pathlib import Path
+from typing import Optional
 
 import ifcopenshell
 import ifcopenshell.api
@@ -13,7 +16,11 @@ import ifcopenshell.api.unit
 import ifcopenshell.guid
 
 from core.cartesian_point import CartesianPoint
+from core.structured_log import get_logger
 from models.ifc_schemas import IfcBeamCreateRequest
+from services.build_progress import BuildProgress, BuildStage
+from services.model_compactor import CompactionReport, compact_model
+from services.model_partitioner import Partitioning, write_partitions
 from services.strategies.building_element_creator import IfcBuildingElementCreator
 from services.strategies.ifc4_strategy import IFC4Strategy
 from services.strategies.model_strategy import IfcModelStrategy
@@ -21,9 +28,18 @@ from services.strategies.model_strategy import IfcModelStrategy
 
 # https://docs.ifcopenshell.org/ifcopenshell-python/code_examples.html
 
+OUTPUT_DIR = Path("generated")
+
+# One in this many element.added events is logged
+ELEMENT_LOG_SAMPLE = 1000
+
+log = get_logger(__name__)
+
+
 class IfcModelManager:
     def __init__(self, schema_strategy: IfcModelStrategy = None):
         self.strategy = schema_strategy or IFC4Strategy()
+        self.entities = self.strategy.get_entity_constructors()
         self.model = None
         self.project = None
         self.site = None
@@ -33,26 +49,34 @@ class IfcModelManager:
         self.owner_history = None
 
         self._building_element_entities = []
+        self._contained_element_count = 0
+        self.progress: Optional[BuildProgress] = None
+        self.compaction: Optional[CompactionReport] = None
 
         # model = ifcopenshell.api.project.create_file()
 
+    def track_progress(self, progress: Optional[BuildProgress]) -> 'IfcModelManager':
+        """Report build stage, element count and bytes written to ``progress``"""
+        self.progress = progress
+        return self
+
     def create_file(self) -> 'IfcModelManager':
         self.model = ifcopenshell.file(schema=self.strategy.get_schema())
-        # header: IfcSpfHeader = None
-        # header.file_schema
-        print(self.model.wrapped_data.header)
+        log.debug("model.created", schema=self.model.schema)
         return self
 
     def initialize_model(self, project_name: str = "Demo Project",
                          description: str = "IFC Reference View") -> 'IfcModelManager':
+        if self.progress is not None:
+            self.progress.stage = BuildStage.SKELETON
         origin = self._create_cartesian_point(CartesianPoint(0.0, 0.0, 0.0))
         axis = self._create_direction(CartesianPoint(0.0, 0.0, 1.0))  # Z-axis
         ref_direction = self._create_direction(CartesianPoint(1.0, 0.0, 0.0))
         world_coordinate_system = self._create_axis_2placement_3d(origin, axis, ref_direction)
 
-        true_north = self.model.create_entity("IfcDirection", DirectionRatios=(0.0, 1.0))
-        self.context = self.model.create_entity(
-            "IfcGeometricRepresentationContext",
+        true_north = self.entities.IfcDirection(self.model, DirectionRatios=(0.0, 1.0))
+        self.context = self.entities.IfcGeometricRepresentationContext(
+            self.model,
             ContextIdentifier="Body",
             ContextType="Model",
             CoordinateSpaceDimension=3,
@@ -63,8 +87,8 @@ class IfcModelManager:
 
         self.owner_history = self._create_owner_history()
 
-        self.project = self.model.create_entity(
-            "IfcProject",
+        self.project = self.entities.IfcProject(
+            self.model,
             GlobalId=ifcopenshell.guid.new(),
             OwnerHistory=self.owner_history,
             Name=project_name,
@@ -85,7 +109,7 @@ class IfcModelManager:
         return self
 
     def _create_cartesian_point(self, point: CartesianPoint):
-        origin = self.model.create_entity("IfcCartesianPoint", Coordinates=(point.x, point.y, point.z))
+        origin = self.entities.IfcCartesianPoint(self.model, Coordinates=(point.x, point.y, point.z))
         return origin
 
     def add_building_element(self, creator: IfcBuildingElementCreator) -> 'IfcModelManager':
@@ -95,18 +119,23 @@ class IfcModelManager:
 
         instance = creator.create_element(
             self.model,
+            self.entities,
             self.context,
             self.owner_history,
             self.storey
         )
         self._building_element_entities.append(instance)
+        if self.progress is not None:
+            self.progress.element_added()
+        log.debug("element.added", sample=ELEMENT_LOG_SAMPLE, element=instance,
+                  elements=len(self._building_element_entities))
 
         return self
 
     def _create_axis_2placement_3d(self, origin: ifcopenshell.entity_instance, axis: ifcopenshell.entity_instance,
                                    ref_direction: ifcopenshell.entity_instance) -> ifcopenshell.entity_instance:
-        axis2placement3d = self.model.create_entity(
-            "IfcAxis2Placement3D",
+        axis2placement3d = self.entities.IfcAxis2Placement3D(
+            self.model,
             Location=origin,
             Axis=axis,
             RefDirection=ref_direction
@@ -114,43 +143,110 @@ class IfcModelManager:
         return axis2placement3d
 
     def _create_direction(self, point: CartesianPoint):
-        axis = self.model.create_entity("IfcDirection", DirectionRatios=(point.x, point.y, point.z))
+        axis = self.entities.IfcDirection(self.model, DirectionRatios=(point.x, point.y, point.z))
         return axis
 
-    def save(self, file_path: str = None) -> str:
+    def save(self, file_path: str = None, compact: bool = False, partitioning: Optional[Partitioning] = None) -> str:
+        """Write the model; with ``compact`` a deduplicated and purged copy is written instead
+        and its report is kept in ``self.compaction``.
+
+        With ``partitioning`` one self-contained file per storey or tile is written next to
+        ``file_path`` (see model_partitioner.write_partitions), each compacted if ``compact``,
+        and the path of their manifest is returned.
+        """
         if file_path is None:
             file_path = self._generate_file_path()
-
-        self.model.write(file_path)
+        start = time.perf_counter()
+
+        if self.progress is not None:
+            self.progress.stage = BuildStage.RELATIONS
+        self._contain_building_elements()
+
+        if partitioning is not None:
+            manifest_path = self._save_partitions(file_path, compact, partitioning)
+            log.info("model.saved", path=manifest_path, partitioning=partitioning.describe(), compact=compact,
+                     seconds=time.perf_counter() - start)
+            return manifest_path
+
+        model = self.model
+        if compact:
+            if self.progress is not None:
+                self.progress.stage = BuildStage.COMPACTION
+            model, self.compaction = compact_model(self.model)
+
+        if self.progress is not None:
+            self.progress.output_path = file_path
+            self.progress.stage = BuildStage.SERIALIZATION
+        model.write(file_path)
+        if self.progress is not None:
+            self.progress.entities = len(model.wrapped_data.entity_names())
+            self.progress.bytes_written = os.path.getsize(file_path)
+        log.info("model.saved", path=file_path, elements=len(self._building_element_entities), compact=compact,
+                 seconds=time.perf_counter() - start)
         return file_path
 
+    def _save_partitions(self, file_path: str, compact: bool, partitioning: Partitioning) -> str:
+        if self.progress is not None:
+            self.progress.stage = BuildStage.SERIALIZATION
+        manifest_path = write_partitions(self.model, file_path, partitioning, compact)
+        if self.progress is not None:
+            partitions = json.loads(Path(manifest_path).read_text())["partitions"]
+            self.progress.output_path = manifest_path
+            self.progress.entities = sum(partition["entities"] for partition in partitions)
+            self.progress.bytes_written = sum(partition["bytes"] for partition in partitions)
+        return manifest_path
+
+    def _contain_building_elements(self) -> None:
+        """Add the elements created since the last save to the storey's spatial containment.
+
+        Done once per save instead of once per element: rewriting RelatedElements for every
+        new element is quadratic in the element count.
+        """
+        pending = self._building_element_entities[self._contained_element_count:]
+        if not pending:
+            return
+
+        for rel in self.model.by_type("IfcRelContainedInSpatialStructure"):
+            if rel.RelatingStructure == self.storey:
+                rel.RelatedElements = list(rel.RelatedElements) + pending
+                break
+        else:
+            self.entities.IfcRelContainedInSpatialStructure(
+                self.model,
+                GlobalId=ifcopenshell.guid.new(),
+                OwnerHistory=self.owner_history,
+                RelatingStructure=self.storey,
+                RelatedElements=pending
+            )
+        self._contained_element_count = len(self._building_element_entities)
+
     def _create_owner_history(self) -> ifcopenshell.entity_instance:
 
         creation_date_time = int(time.time())
-        person = self.model.create_entity(
-            "IfcPerson",
+        person = self.entities.IfcPerson(
+            self.model,
             FamilyName="Brunner",
             GivenName="Michael"
         )
-        organization = self.model.create_entity(
-            "IfcOrganization",
+        organization = self.entities.IfcOrganization(
+            self.model,
             Name="Brunner246",
             Description="Brunner246"
         )
-        person_and_organization = self.model.create_entity(
-            "IfcPersonAndOrganization",
+        person_and_organization = self.entities.IfcPersonAndOrganization(
+            self.model,
             ThePerson=person,
             TheOrganization=organization
         )
-        application = self.model.create_entity(
-            "IfcApplication",
+        application = self.entities.IfcApplication(
+            self.model,
             ApplicationDeveloper=organization,
             Version="0.1.0",
             ApplicationFullName="IfcCreator",
             ApplicationIdentifier="ABC123"
         )
-        return self.model.create_entity(
-            "IfcOwnerHistory",
+        return self.entities.IfcOwnerHistory(
+            self.model,
             OwningUser=person_and_organization,
             OwningApplication=application,
             CreationDate=creation_date_time
@@ -158,13 +254,13 @@ class IfcModelManager:
 
     def _create_site(self, world_coordinate_system) -> ifcopenshell.entity_instance:
         """Create site entity"""
-        site_placement = self.model.create_entity(
-            "IfcLocalPlacement",
+        site_placement = self.entities.IfcLocalPlacement(
+            self.model,
             PlacementRelTo=None,
             RelativePlacement=world_coordinate_system
         )
-        return self.model.create_entity(
-            "IfcSite",
+        return self.entities.IfcSite(
+            self.model,
             GlobalId=ifcopenshell.guid.new(),
             OwnerHistory=self.owner_history,
             Name="Site",
@@ -172,16 +268,16 @@ class IfcModelManager:
         )
 
     def _create_building(self) -> ifcopenshell.entity_instance:
-        building_placement = self.model.create_entity(
-            "IfcLocalPlacement",
+        building_placement = self.entities.IfcLocalPlacement(
+            self.model,
             PlacementRelTo=self.site.ObjectPlacement,
-            RelativePlacement=self.model.create_entity(
-                "IfcAxis2Placement3D",
-                Location=self.model.create_entity("IfcCartesianPoint", Coordinates=(0.0, 0.0, 0.0))
+            RelativePlacement=self.entities.IfcAxis2Placement3D(
+                self.model,
+                Location=self.entities.IfcCartesianPoint(self.model, Coordinates=(0.0, 0.0, 0.0))
             )
         )
-        return self.model.create_entity(
-            "IfcBuilding",
+        return self.entities.IfcBuilding(
+            self.model,
             GlobalId=ifcopenshell.guid.new(),
             OwnerHistory=self.owner_history,
             Name="Building",
@@ -189,16 +285,16 @@ class IfcModelManager:
         )
 
     def _create_storey(self) -> ifcopenshell.entity_instance:
-        storey_placement = self.model.create_entity(
-            "IfcLocalPlacement",
+        storey_placement = self.entities.IfcLocalPlacement(
+            self.model,
             PlacementRelTo=self.building.ObjectPlacement,
-            RelativePlacement=self.model.create_entity(
-                "IfcAxis2Placement3D",
-                Location=self.model.create_entity("IfcCartesianPoint", Coordinates=(0.0, 0.0, 0.0))
+            RelativePlacement=self.entities.IfcAxis2Placement3D(
+                self.model,
+                Location=self.entities.IfcCartesianPoint(self.model, Coordinates=(0.0, 0.0, 0.0))
             )
         )
-        return self.model.create_entity(
-            "IfcBuildingStorey",
+        return self.entities.IfcBuildingStorey(
+            self.model,
             GlobalId=ifcopenshell.guid.new(),
             OwnerHistory=self.owner_history,
             Name="Storey",
@@ -206,8 +302,8 @@ class IfcModelManager:
         )
 
     def _create_aggregation(self, relating_object, related_objects) -> ifcopenshell.entity_instance:
-        return self.model.create_entity(
-            "IfcRelAggregates",
+        return self.entities.IfcRelAggregates(
+            self.model,
             GlobalId=ifcopenshell.guid.new(),
             OwnerHistory=self.owner_history,
             RelatingObject=relating_object,
@@ -217,6 +313,5 @@ class IfcModelManager:
     @staticmethod
     def _generate_file_path() -> str:
         """Generate a unique file path"""
-        output_dir = Path("generated")
-        output_dir.mkdir(exist_ok=True)
-        return str(output_dir / f"{uuid.uuid4()}.ifc")
+        OUTPUT_DIR.mkdir(exist_ok=True)
+        return str(OUTPUT_DIR / f"{uuid.uuid4()}.ifc")
@@ -1,13 +1,16 @@
 from core.cartesian_point import CartesianPoint
 from models.dto.beam_dto import BeamDTO
 from models.dto.building_element_dto import BuildingElementDTO
-from models.ifc_schemas import IfcBeamCreateRequest
+from models.ifc_schemas import IfcBeamCreateRequest, IfcBeamRow
+from services.build_progress import BuildProgress
 from services.ifc_model_manager import IfcModelManager
+from services.model_partitioner import Partitioning
 from services.strategies.beam_creator import IfcBeamCreator
 from services.strategies.ifc2x3_strategy import IFC2X3Strategy
 from services.strategies.ifc4_strategy import IFC4Strategy
 from services.strategies.ifc4x3_strategy import IFC4X3Strategy
 import copy
+from typing import Iterable, Optional
 
 
 class IfcModelManagerFactory:
@@ -54,3 +57,33 @@ def create_ifc_file(data: IfcBeamCreateRequest, schema: str = "IFC4") -> str:
      )
 
     return manager.save()
+
+
+def beam_dto_from_row(row: IfcBeamRow) -> BeamDTO:
+    return BeamDTO(
+        building_element=BuildingElementDTO(
+            name=row.name,
+            location=CartesianPoint(row.x, row.y, row.z)
+        ),
+        width=row.width,
+        height=row.height,
+        length=row.length)
+
+
+def create_ifc_beams_file(rows: Iterable[IfcBeamRow], schema: str = "IFC4",
+                          progress: Optional[BuildProgress] = None, compact: bool = False,
+                          partitioning: Optional[Partitioning] = None) -> str:
+    """Create an IFC file with one beam per row; compaction and partitioning as in IfcModelManager.save"""
+    return create_beams_model((beam_dto_from_row(row) for row in rows), schema, progress, compact, partitioning)
+
+
+def create_beams_model(beams: Iterable[BeamDTO], schema: str = "IFC4",
+                       progress: Optional[BuildProgress] = None, compact: bool = False,
+                       partitioning: Optional[Partitioning] = None) -> str:
+    """Create an IFC file with one beam per DTO"""
+    manager = IfcModelManagerFactory.create_manager(schema).track_progress(progress)
+    manager.create_file().initialize_model()
+    for beam in beams:
+        manager.add_building_element(IfcBeamCreator(beam))
+
+    return manager.save(compact=compact, partitioning=partitioning)
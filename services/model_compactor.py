@@ -0,0 +1,309 @@
+import functools
+import os
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, List, Optional, Set, Tuple
+
+import ifcopenshell
+import ifcopenshell.ifcopenshell_wrapper as ifcopenshell_wrapper
+
+from core.structured_log import logged
+
+# Never merged, even when attribute-identical: rooted objects carry identity (GlobalId), and
+# these resources are owned by exactly one parent (e.g. IfcLocalPlacement.PlacesObject and
+# IfcProductDefinitionShape.ShapeOfProduct are SET [1:1] in IFC2X3, and
+# IfcRepresentation.OfProductRepresentation is SET [0:1])
+UNMERGED_TYPES = (
+    "IfcRoot",
+    "IfcObjectPlacement",
+    "IfcProductRepresentation",
+    "IfcRepresentation",
+    "IfcMaterialLayer",
+    "IfcMaterialProfile",
+    "IfcMaterialConstituent",
+)
+
+# Resources attached to the graph only through an inverse attribute of what they reference.
+# They are kept as roots, and what they point at is never merged, so that e.g. a styled
+# solid does not take on another solid's style.
+ATTACHED_TYPES = (
+    "IfcStyledItem",
+    "IfcPresentationLayerAssignment",
+    "IfcMaterialDefinitionRepresentation",
+    "IfcExternalReferenceRelationship",
+    "IfcResourceConstraintRelationship",
+)
+
+# Resources that also hang off the graph by an inverse attribute, but only belong to the model
+# while something they refer to does, e.g. IfcMapConversion.SourceCRS or
+# IfcMaterialProperties.Material. Any other entity nothing refers to is purged.
+DEPENDENT_TYPES = (
+    "IfcCoordinateOperation",
+    "IfcMaterialProperties",
+    "IfcProfileProperties",
+    "IfcResourceLevelRelationship",
+    "IfcIndexedColourMap",
+    "IfcTextureCoordinate",
+)
+
+
+@dataclass(slots=True)
+class CompactionReport:
+    entities_before: int
+    entities_after: int
+    duplicates_merged: int
+    unreachable_removed: int
+    bytes_saved: int
+
+    @property
+    def entities_saved(self) -> int:
+        return self.entities_before - self.entities_after
+
+
+@functools.lru_cache(maxsize=None)
+def _subtypes(schema: str, type_names: Tuple[str, ...]) -> FrozenSet[str]:
+    """Names of ``type_names`` and all their subtypes that exist in ``schema``"""
+    declarations = ifcopenshell_wrapper.schema_by_name(schema)
+    names = set()
+    pending = []
+    for type_name in type_names:
+        try:
+            pending.append(declarations.declaration_by_name(type_name))
+        except RuntimeError:
+            continue
+    while pending:
+        declaration = pending.pop()
+        names.add(declaration.name())
+        pending.extend(declaration.subtypes())
+    return frozenset(names)
+
+
+@functools.lru_cache(maxsize=None)
+def _set_attributes(schema: str, type_name: str) -> FrozenSet[int]:
+    """Indices of the SET-valued attributes of ``type_name``"""
+    declaration = ifcopenshell_wrapper.schema_by_name(schema).declaration_by_name(type_name)
+    indices = set()
+    for index, attribute in enumerate(declaration.all_attributes()):
+        aggregation = attribute.type_of_attribute().as_aggregation_type()
+        if aggregation is not None and aggregation.type_of_aggregation_string() == "set":
+            indices.add(index)
+    return frozenset(indices)
+
+
+def _copy_header(source: ifcopenshell.file, target: ifcopenshell.file) -> None:
+    source_header, target_header = source.wrapped_data.header, target.wrapped_data.header
+    for name in ("description", "implementation_level"):
+        setattr(target_header.file_description, name, getattr(source_header.file_description, name))
+    for name in ("name", "time_stamp", "author", "organization", "preprocessor_version", "originating_system",
+                 "authorization"):
+        setattr(target_header.file_name, name, getattr(source_header.file_name, name))
+
+
+def _attribute_values(instance: ifcopenshell.entity_instance) -> tuple:
+    return tuple(instance[index] for index in range(len(instance)))
+
+
+def _references(value, found: List[ifcopenshell.entity_instance]) -> None:
+    """Collect the entity instances referenced by an attribute value"""
+    if isinstance(value, ifcopenshell.entity_instance):
+        if value.id():
+            found.append(value)
+    elif isinstance(value, tuple):
+        for item in value:
+            _references(item, found)
+
+
+class ModelCompactor:
+    """Merges attribute-identical entities and removes entities nothing refers to.
+
+    Entities are keyed bottom-up by type and attribute values, with references replaced by
+    the key's canonical instance, so whole identical subgraphs collapse in one pass. Every
+    entity is visited a constant number of times, which keeps the pass linear in file size.
+    Reachability starts from IfcRoot instances and ATTACHED_TYPES, and extends to
+    DEPENDENT_TYPES that refer into the reachable graph; orphaned rooted objects are kept
+    since they carry a GlobalId.
+    """
+
+    def __init__(self, model: ifcopenshell.file):
+        self.model = model
+        self._schema = model.wrapped_data.schema
+        self._unmerged = _subtypes(self._schema, UNMERGED_TYPES)
+        self._attached = _subtypes(self._schema, ATTACHED_TYPES)
+        self._dependent = _subtypes(self._schema, DEPENDENT_TYPES)
+        self._rooted = _subtypes(self._schema, ("IfcRoot",))
+
+    def compact(self) -> Tuple[ifcopenshell.file, CompactionReport]:
+        """Returns a new file with the reachable canonical entities, renumbered.
+
+        References in the source model are redirected to canonical instances along the way,
+        which leaves it a valid model with the duplicates orphaned. Copying the survivors is
+        used instead of removing the rest in place, since ifcopenshell's removal is not
+        linear in the number of removed entities.
+        """
+        entities_before = len(self.model.wrapped_data.entity_names())
+        canonical = self._merge_duplicates()
+        reachable = self._reachable(canonical)
+
+        compacted = ifcopenshell.file(schema=self._schema)
+        _copy_header(self.model, compacted)
+        bytes_saved = 0
+        for instance in self.model:
+            if instance.id() in reachable:
+                compacted.add(instance)
+            else:
+                bytes_saved += len(instance.to_string()) + 1
+
+        duplicates = sum(1 for entity_id, canonical_id in canonical.items()
+                         if canonical_id != entity_id and entity_id not in reachable)
+        return compacted, CompactionReport(
+            entities_before=entities_before,
+            entities_after=len(reachable),
+            duplicates_merged=duplicates,
+            unreachable_removed=entities_before - len(reachable) - duplicates,
+            bytes_saved=bytes_saved,
+        )
+
+    def _merge_duplicates(self) -> Dict[int, int]:
+        """Map every entity id to the id of its canonical instance, rewriting references on the way"""
+        canonical: Dict[int, int] = {}
+        by_key: Dict[tuple, int] = {}
+        pinned = self._pinned()
+        visiting: Set[int] = set()
+
+        for start in self.model:
+            if start.id() in canonical:
+                continue
+            # Iterative post-order DFS: referenced entities are canonicalized before referrers
+            stack = [(start, start.id(), None)]
+            while stack:
+                instance, entity_id, values = stack.pop()
+                if entity_id in canonical:
+                    continue
+                if values is None:
+                    values = _attribute_values(instance)
+                    visiting.add(entity_id)
+                    stack.append((instance, entity_id, values))
+                    children: List[ifcopenshell.entity_instance] = []
+                    _references(values, children)
+                    for child in children:
+                        child_id = child.id()
+                        if child_id not in canonical and child_id not in visiting:
+                            stack.append((child, child_id, None))
+                    continue
+
+                visiting.discard(entity_id)
+                canonical[entity_id] = self._canonicalize(instance, entity_id, values, canonical, by_key, pinned)
+        return canonical
+
+    def _canonicalize(self, instance, entity_id, values, canonical, by_key, pinned) -> int:
+        key_values = []
+        for index, value in enumerate(values):
+            try:
+                rewritten, key_value, changed = self._rewrite(value, canonical)
+            except KeyError:
+                # Part of a reference cycle: keep the entity as it is
+                return entity_id
+            if changed:
+                if index in _set_attributes(self._schema, instance.is_a()):
+                    # Merging can make members of a SET equal
+                    members = dict(zip(key_value, rewritten))
+                    rewritten, key_value = tuple(members.values()), tuple(members)
+                instance[index] = rewritten
+            key_values.append(key_value)
+
+        type_name = instance.is_a()
+        if type_name in self._unmerged or entity_id in pinned:
+            return entity_id
+        return by_key.setdefault((type_name, tuple(key_values)), entity_id)
+
+    def _rewrite(self, value, canonical):
+        """(value referencing canonical instances, hashable key of the value, whether it changed)"""
+        if isinstance(value, ifcopenshell.entity_instance):
+            value_id = value.id()
+            if not value_id:
+                # Typed value of a select, e.g. IfcLabel('x')
+                return value, (value.is_a(), self._rewrite(value.wrappedValue, canonical)[1]), False
+            target_id = canonical[value_id]
+            if target_id == value_id:
+                return value, target_id, False
+            return self.model.by_id(target_id), target_id, True
+        if isinstance(value, tuple):
+            rewritten = [self._rewrite(item, canonical) for item in value]
+            if any(changed for _, _, changed in rewritten):
+                return tuple(item for item, _, _ in rewritten), tuple(key for _, key, _ in rewritten), True
+            return value, tuple(key for _, key, _ in rewritten), False
+        return value, value, False
+
+    def _pinned(self) -> Set[int]:
+        """Ids of entities referenced by ATTACHED_TYPES and DEPENDENT_TYPES"""
+        pinned = set()
+        for type_name in self._attached | self._dependent:
+            for instance in self.model.by_type(type_name, include_subtypes=False):
+                found: List[ifcopenshell.entity_instance] = []
+                _references(_attribute_values(instance), found)
+                pinned.update(reference.id() for reference in found)
+        return pinned
+
+    def _reachable(self, canonical: Dict[int, int]) -> Set[int]:
+        """Ids reachable from IfcRoot instances and ATTACHED_TYPES.
+
+        DEPENDENT_TYPES are kept, with everything they refer to, once one of their references
+        is reachable; that repeats until nothing changes, so chains of them (e.g. a material
+        only related to another by an IfcMaterialRelationship, with its own properties)
+        survive as well.
+        """
+        reachable: Set[int] = set()
+        stack = []
+        # Dependent resources by the ids they refer to, kept once any of those is reached
+        attached_to: Dict[int, List[ifcopenshell.entity_instance]] = {}
+        for instance in self.model:
+            entity_id = instance.id()
+            if canonical.get(entity_id) != entity_id:
+                continue
+            type_name = instance.is_a()
+            if type_name in self._rooted or type_name in self._attached:
+                reachable.add(entity_id)
+                stack.append(instance)
+            elif type_name in self._dependent:
+                found: List[ifcopenshell.entity_instance] = []
+                _references(_attribute_values(instance), found)
+                for reference in found:
+                    attached_to.setdefault(reference.id(), []).append(instance)
+        while stack:
+            instance = stack.pop()
+            for attached in attached_to.pop(instance.id(), ()):
+                if attached.id() not in reachable:
+                    reachable.add(attached.id())
+                    stack.append(attached)
+            found = []
+            _references(_attribute_values(instance), found)
+            for reference in found:
+                reference_id = reference.id()
+                if reference_id not in reachable:
+                    reachable.add(reference_id)
+                    stack.append(reference)
+        return reachable
+
+
+def compact_model(model: ifcopenshell.file) -> Tuple[ifcopenshell.file, CompactionReport]:
+    """Deduplicated and purged copy of ``model``; ``bytes_saved`` is the serialized size of what was dropped"""
+    return ModelCompactor(model).compact()
+
+
+@logged
+def compact_file(source_path: str, target_path: Optional[str] = None) -> CompactionReport:
+    """Compact an IFC file, overwriting it unless ``target_path`` is given.
+
+    ``bytes_saved`` is the difference in file size.
+    """
+    target_path = target_path or source_path
+    bytes_before = os.path.getsize(source_path)
+    try:
+        model = ifcopenshell.open(source_path)
+    except ifcopenshell.Error as exc:
+        raise ValueError(str(exc)) from None
+    except RuntimeError:
+        raise ValueError("Not a readable IFC-SPF file") from None
+    compacted, report = compact_model(model)
+    compacted.write(target_path)
+    report.bytes_saved = bytes_before - os.path.getsize(target_path)
+    return report
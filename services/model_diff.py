@@ -0,0 +1,531 @@
+import functools
+import hashlib
+import re
+from array import array
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, FrozenSet, Iterator, List, NamedTuple, Optional, Tuple, Union
+
+import ifcopenshell.ifcopenshell_wrapper as ifcopenshell_wrapper
+
+from core.structured_log import logged
+
+# Attributes of IfcProduct that are compared on their own or not at all
+IDENTITY_ATTRIBUTES = ("GlobalId", "OwnerHistory")
+PLACEMENT_ATTRIBUTE = "ObjectPlacement"
+GEOMETRY_ATTRIBUTE = "Representation"
+_NOT_OWN_ATTRIBUTES = (*IDENTITY_ATTRIBUTES, PLACEMENT_ATTRIBUTE, GEOMETRY_ATTRIBUTE)
+
+# Referenced by nearly every element and not part of what an element looks like; a reference
+# to one of these is compared by type only, so a re-export that keeps the GlobalIds matches
+# despite new timestamps
+COLLAPSED_TYPES = ("IfcOwnerHistory", "IfcRepresentationContext")
+
+# Significant digits floats are compared at; writers differ in the last bits of e.g. 0.1 + 0.2
+FLOAT_DIGITS = 10
+
+# Entity ids above this are kept in a dict instead of the offset array
+MAX_DENSE_ID = 1 << 26
+
+_TOKEN = re.compile(r"""
+    \s*(?:
+      (?P<string>'(?:[^']|'')*')
+    | \#(?P<ref>\d+)
+    | \.(?P<enum>[A-Z0-9_]+)\.
+    | (?P<number>[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)
+    | "(?P<binary>[0-9A-Fa-f]*)"
+    | (?P<keyword>[A-Z][A-Z0-9_]*)
+    | (?P<punct>[()$*,])
+    )""", re.VERBOSE)
+
+# Tokens of a record body as they are hashed: strings and names verbatim, references
+# replaced by what they point at, numbers normalized and whitespace dropped
+_CANONICAL = re.compile(r"""
+      (?P<string>'(?:[^']|'')*')
+    | \#(?P<ref>\d+)
+    | (?P<keyword>[A-Z][A-Z0-9_]*)
+    | (?P<number>[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)
+    | (?P<space>\s+)
+    """, re.VERBOSE)
+
+_RECORD = re.compile(rb"#(\d+)\s*=\s*([A-Za-z0-9_]+)\s*\(")
+_PRODUCT_GUID = re.compile(r"\s*'((?:[^']|'')*)'")
+_FILE_SCHEMA = re.compile(rb"FILE_SCHEMA\s*\(\s*\(\s*'([^']*)'")
+
+
+class Reference(NamedTuple):
+    id: int
+
+
+class TypedValue(NamedTuple):
+    type: str
+    value: Any
+
+
+class Enumeration(NamedTuple):
+    value: str
+
+
+@dataclass(slots=True)
+class ElementSummary:
+    global_id: str
+    type: str
+    name: Optional[str]
+
+
+@dataclass(slots=True)
+class ElementChange:
+    global_id: str
+    type: str
+    name: Optional[str]
+    # Which of "type", "attributes", "placement" and "geometry" differ
+    aspects: List[str] = field(default_factory=list)
+    # Attribute path -> [old, new], e.g. "Representation.Representations[0].Items[0].Depth"
+    changes: Dict[str, List[Any]] = field(default_factory=dict)
+
+
+@dataclass(slots=True)
+class ModelDiff:
+    added: List[ElementSummary] = field(default_factory=list)
+    removed: List[ElementSummary] = field(default_factory=list)
+    modified: List[ElementChange] = field(default_factory=list)
+    unchanged: int = 0
+
+
+@functools.lru_cache(maxsize=None)
+def _declarations(schema: str):
+    try:
+        return ifcopenshell_wrapper.schema_by_name(schema)
+    except Exception:
+        raise ValueError(f"Unsupported schema: {schema}") from None
+
+
+@functools.lru_cache(maxsize=None)
+def _subtypes(schema: str, type_name: str) -> FrozenSet[str]:
+    """Upper-cased names of ``type_name`` and its subtypes, as they appear in STEP records"""
+    try:
+        pending = [_declarations(schema).declaration_by_name(type_name)]
+    except RuntimeError:
+        return frozenset()
+    names = set()
+    while pending:
+        declaration = pending.pop()
+        names.add(declaration.name().upper())
+        pending.extend(declaration.subtypes())
+    return frozenset(names)
+
+
+@functools.lru_cache(maxsize=None)
+def _attribute_names(schema: str, type_name: str) -> Tuple[str, ...]:
+    declaration = _declarations(schema).declaration_by_name(type_name)
+    return tuple(attribute.name() for attribute in declaration.all_attributes())
+
+
+@functools.lru_cache(maxsize=None)
+def _type_name(schema: str, type_name: str) -> str:
+    """Schema spelling of an upper-cased STEP type name, e.g. IfcBeam for IFCBEAM"""
+    try:
+        return _declarations(schema).declaration_by_name(type_name).name()
+    except RuntimeError:
+        return type_name
+
+
+def _unescape(token: str) -> str:
+    return token[1:-1].replace("''", "'")
+
+
+def _parse_values(text: str) -> tuple:
+    """Attribute values of the argument list ``text`` (without the outer parentheses)"""
+    stack: List[list] = [[]]
+    typed: List[Optional[str]] = [None]
+    keyword = None
+    position = 0
+    while position < len(text):
+        match = _TOKEN.match(text, position)
+        if match is None:
+            if text[position:].strip():
+                raise ValueError(f"Unexpected characters in record: {text[position:position + 20]!r}")
+            break
+        position = match.end()
+        kind = match.lastgroup
+        token = match.group(kind)
+        if kind == "punct":
+            if token == "(":
+                stack.append([])
+                typed.append(keyword)
+                keyword = None
+            elif token == ")":
+                values = tuple(stack.pop())
+                type_name = typed.pop()
+                if type_name is not None:
+                    stack[-1].append(TypedValue(type_name, values[0] if len(values) == 1 else values))
+                else:
+                    stack[-1].append(values)
+            elif token in "$*":
+                stack[-1].append(None)
+        elif kind == "string":
+            stack[-1].append(_unescape(token))
+        elif kind == "ref":
+            stack[-1].append(Reference(int(token)))
+        elif kind == "enum":
+            stack[-1].append(True if token == "T" else False if token == "F" else Enumeration(token))
+        elif kind == "number":
+            stack[-1].append(_number(token))
+        elif kind == "binary":
+            stack[-1].append(token)
+        else:
+            keyword = token
+    if len(stack) != 1:
+        raise ValueError("Unbalanced parentheses in record")
+    return tuple(stack[0])
+
+
+def _number(token: str) -> Union[int, float]:
+    if "." not in token and "e" not in token and "E" not in token:
+        return int(token)
+    value = float(f"{float(token):.{FLOAT_DIGITS}g}")
+    return value + 0.0  # -0.0 == 0.0, but they would hash differently as text
+
+
+class _LRU(OrderedDict):
+    def __init__(self, maxsize: int):
+        super().__init__()
+        self.maxsize = maxsize
+
+    def put(self, key, value):
+        self[key] = value
+        if len(self) > self.maxsize:
+            self.popitem(last=False)
+        return value
+
+    def lookup(self, key):
+        value = self.get(key)
+        if value is not None:
+            self.move_to_end(key)
+        return value
+
+
+class StepReader:
+    """Random access to the entity records of an IFC-SPF file without loading it.
+
+    One pass records the byte offset and type of every record and the GlobalId of every
+    IfcProduct; records are read again on demand and parsed through a bounded cache. Memory
+    grows by 10 bytes per entity plus the product index, instead of the full entity graph
+    ifcopenshell builds.
+    """
+
+    def __init__(self, path: str, cache_size: int = 20000):
+        self.path = path
+        self.schema = ""
+        self.products: Dict[str, Tuple[int, str]] = {}
+        self._offsets = array("q")
+        self._type_codes = array("H")
+        self._type_names: List[str] = []
+        self._type_index: Dict[str, int] = {}
+        self._sparse: Dict[int, Tuple[int, int]] = {}
+        self._records = _LRU(cache_size)
+        self._file = open(path, "rb")
+        try:
+            self._index()
+        except BaseException:
+            self._file.close()
+            raise
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self) -> 'StepReader':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def _index(self) -> None:
+        in_data = False
+        offset = self._file.tell()
+        pending_offset, pending = None, b""
+        products = None
+        for line in self._file:
+            line_offset, offset = offset, offset + len(line)
+            if not in_data:
+                stripped = line.strip()
+                if stripped.startswith(b"FILE_SCHEMA"):
+                    match = _FILE_SCHEMA.match(stripped)
+                    if match:
+                        self.schema = match.group(1).decode("latin-1")
+                elif stripped == b"DATA;":
+                    if not self.schema:
+                        raise ValueError("Not a readable IFC-SPF file")
+                    products = _subtypes(self.schema, "IfcProduct")
+                    in_data = True
+                continue
+            if pending_offset is None:
+                if line.strip() == b"ENDSEC;":
+                    break
+                if not line.strip():
+                    continue
+                pending_offset, pending = line_offset, line
+            else:
+                pending += line
+            if not _complete(pending):
+                continue
+            match = _RECORD.match(pending.lstrip())
+            if match is None:
+                raise ValueError(f"Malformed record at byte {pending_offset}")
+            entity_id, type_name = int(match.group(1)), match.group(2).decode("latin-1").upper()
+            self._store(entity_id, pending_offset, type_name)
+            if type_name in products:
+                guid = _PRODUCT_GUID.match(pending.lstrip()[match.end():].decode("latin-1"))
+                if guid:
+                    self.products[_unescape(f"'{guid.group(1)}'")] = (entity_id, type_name)
+            pending_offset, pending = None, b""
+        if not in_data:
+            raise ValueError("Not a readable IFC-SPF file")
+
+    def _store(self, entity_id: int, offset: int, type_name: str) -> None:
+        code = self._type_index.get(type_name)
+        if code is None:
+            code = self._type_index[type_name] = len(self._type_names)
+            self._type_names.append(type_name)
+        if entity_id > MAX_DENSE_ID:
+            self._sparse[entity_id] = (offset, code)
+            return
+        if entity_id >= len(self._offsets):
+            grow = entity_id + 1 - len(self._offsets)
+            self._offsets.extend([-1] * grow)
+            self._type_codes.extend([0] * grow)
+        self._offsets[entity_id] = offset
+        self._type_codes[entity_id] = code
+
+    def _locate(self, entity_id: int) -> Tuple[int, int]:
+        if entity_id < len(self._offsets) and self._offsets[entity_id] >= 0:
+            return self._offsets[entity_id], self._type_codes[entity_id]
+        if entity_id in self._sparse:
+            return self._sparse[entity_id]
+        raise ValueError(f"Reference to missing entity #{entity_id}")
+
+    def type_of(self, entity_id: int) -> str:
+        """Upper-cased type name of entity ``#entity_id``"""
+        return self._type_names[self._locate(entity_id)[1]]
+
+    def body(self, entity_id: int) -> str:
+        """Unparsed attribute list of entity ``#entity_id``, without the outer parentheses"""
+        self._file.seek(self._locate(entity_id)[0])
+        raw = b""
+        for line in self._file:
+            raw += line
+            if _complete(raw):
+                break
+        text = raw.decode("latin-1").strip()
+        return text[text.index("(") + 1:text.rindex(")")]
+
+    def record(self, entity_id: int) -> Tuple[str, tuple]:
+        """(upper-cased type name, attribute values) of entity ``#entity_id``"""
+        cached = self._records.lookup(entity_id)
+        if cached is not None:
+            return cached
+        return self._records.put(entity_id, (self.type_of(entity_id), _parse_values(self.body(entity_id))))
+
+
+def _complete(record: bytes) -> bool:
+    """Whether ``record`` ends with the terminating semicolon outside of a string"""
+    return record.rstrip().endswith(b";") and record.count(b"'") % 2 == 0
+
+
+class _Fingerprinter:
+    """Content digests of entity subgraphs, independent of entity ids.
+
+    References are replaced by the digest of what they point at (a Merkle tree), so equal
+    geometry hashes equally wherever it is in the file. Rooted objects are referred to by
+    GlobalId and COLLAPSED_TYPES by type name, which keeps each digest to the element's own
+    resources.
+    """
+
+    def __init__(self, reader: StepReader, cache_size: int = 50000):
+        self.reader = reader
+        self._digests = _LRU(cache_size)
+        self._rooted = _subtypes(reader.schema, "IfcRoot")
+        self._collapsed = frozenset().union(*(_subtypes(reader.schema, name) for name in COLLAPSED_TYPES))
+
+    def digest(self, entity_id: int, visiting: Optional[set] = None) -> bytes:
+        cached = self._digests.lookup(entity_id)
+        if cached is not None:
+            return cached
+        visiting = visiting if visiting is not None else set()
+        if entity_id in visiting:
+            raise ValueError(f"Reference cycle through entity #{entity_id}")
+        visiting.add(entity_id)
+
+        def canonical(match: re.Match) -> str:
+            kind = match.lastgroup
+            if kind == "ref":
+                reference = int(match.group(kind))
+                key = self.reference_key(reference)
+                return f"<{key}>" if key is not None else f"#{self.digest(reference, visiting).hex()}"
+            if kind == "number":
+                return repr(_number(match.group(kind)))
+            if kind == "space":
+                return ""
+            return match.group(kind)
+
+        hasher = hashlib.blake2b(self.reader.type_of(entity_id).encode(), digest_size=16)
+        hasher.update(_CANONICAL.sub(canonical, self.reader.body(entity_id)).encode())
+        visiting.discard(entity_id)
+        return self._digests.put(entity_id, hasher.digest())
+
+    def values_digest(self, values, visiting: Optional[set] = None) -> bytes:
+        hasher = hashlib.blake2b(digest_size=16)
+        for value in values:
+            self._update(hasher, value, visiting if visiting is not None else set())
+        return hasher.digest()
+
+    def reference_key(self, entity_id: int) -> Optional[str]:
+        """Stand-in for a reference that is not followed, or None"""
+        type_name = self.reader.type_of(entity_id)
+        if type_name in self._collapsed:
+            return _type_name(self.reader.schema, type_name)
+        if type_name in self._rooted:
+            return f"{_type_name(self.reader.schema, type_name)}:{self.reader.record(entity_id)[1][0]}"
+        return None
+
+    def _update(self, hasher, value, visiting: set) -> None:
+        if isinstance(value, Reference):
+            key = self.reference_key(value.id)
+            if key is not None:
+                hasher.update(b"k" + key.encode() + b"\0")
+            else:
+                hasher.update(b"#" + self.digest(value.id, visiting))
+        elif isinstance(value, TypedValue):
+            hasher.update(b"t" + value.type.encode() + b"(")
+            self._update(hasher, value.value, visiting)
+            hasher.update(b")")
+        elif isinstance(value, tuple) and not isinstance(value, Enumeration):
+            hasher.update(b"(")
+            for item in value:
+                self._update(hasher, item, visiting)
+            hasher.update(b")")
+        else:
+            hasher.update(f"{type(value).__name__}:{value!r}\0".encode())
+
+
+class _Element(NamedTuple):
+    type: str
+    name: Optional[str]
+    attributes: bytes
+    placement: bytes
+    geometry: bytes
+
+
+def _element(fingerprinter: _Fingerprinter, entity_id: int) -> _Element:
+    reader = fingerprinter.reader
+    type_name, values = reader.record(entity_id)
+    names = _attribute_names(reader.schema, type_name)
+    own = [value for name, value in zip(names, values) if name not in _NOT_OWN_ATTRIBUTES]
+    by_name = dict(zip(names, values))
+    return _Element(
+        type=_type_name(reader.schema, type_name),
+        name=by_name.get("Name"),
+        attributes=fingerprinter.values_digest(own),
+        placement=fingerprinter.values_digest((by_name.get(PLACEMENT_ATTRIBUTE),)),
+        geometry=fingerprinter.values_digest((by_name.get(GEOMETRY_ATTRIBUTE),)),
+    )
+
+
+def _flatten(fingerprinter: _Fingerprinter, value, path: str, found: Dict[str, Any], depth: int = 0) -> None:
+    """Leaf values of the subgraph under ``value`` keyed by attribute path"""
+    if depth > 64:
+        raise ValueError(f"Subgraph too deep at {path}")
+    if isinstance(value, Reference):
+        key = fingerprinter.reference_key(value.id)
+        if key is not None:
+            found[path] = key
+            return
+        type_name, values = fingerprinter.reader.record(value.id)
+        found[f"{path}.type" if path else "type"] = _type_name(fingerprinter.reader.schema, type_name)
+        for name, item in zip(_attribute_names(fingerprinter.reader.schema, type_name), values):
+            _flatten(fingerprinter, item, f"{path}.{name}" if path else name, found, depth + 1)
+    elif isinstance(value, TypedValue):
+        _flatten(fingerprinter, value.value, path, found, depth + 1)
+    elif isinstance(value, Enumeration):
+        found[path] = value.value
+    elif isinstance(value, tuple):
+        if all(not isinstance(item, (Reference, TypedValue, tuple)) for item in value):
+            found[path] = [item.value if isinstance(item, Enumeration) else item for item in value]
+            return
+        for index, item in enumerate(value):
+            _flatten(fingerprinter, item, f"{path}[{index}]", found, depth + 1)
+    else:
+        found[path] = value
+
+
+def _changes(old: _Fingerprinter, new: _Fingerprinter, old_id: int, new_id: int,
+             aspects: List[str]) -> Dict[str, List[Any]]:
+    """Changed leaf values of the aspects that differ, as path -> [old, new]"""
+    old_type, old_values = old.reader.record(old_id)
+    new_type, new_values = new.reader.record(new_id)
+    old_by_name = dict(zip(_attribute_names(old.reader.schema, old_type), old_values))
+    new_by_name = dict(zip(_attribute_names(new.reader.schema, new_type), new_values))
+    selected = set()
+    if "attributes" in aspects or "type" in aspects:
+        selected.update(name for name in (*old_by_name, *new_by_name) if name not in _NOT_OWN_ATTRIBUTES)
+    if "placement" in aspects:
+        selected.add(PLACEMENT_ATTRIBUTE)
+    if "geometry" in aspects:
+        selected.add(GEOMETRY_ATTRIBUTE)
+
+    old_leaves: Dict[str, Any] = {}
+    new_leaves: Dict[str, Any] = {}
+    for name in sorted(selected):
+        _flatten(old, old_by_name.get(name), name, old_leaves)
+        _flatten(new, new_by_name.get(name), name, new_leaves)
+    changes = {}
+    for path in dict.fromkeys((*old_leaves, *new_leaves)):
+        before, after = old_leaves.get(path), new_leaves.get(path)
+        if before != after:
+            changes[path] = [before, after]
+    return changes
+
+
+def iter_diff(old_path: str, new_path: str) -> Iterator[Tuple[str, Union[ElementSummary, ElementChange]]]:
+    """Yield ("removed" | "modified" | "unchanged" | "added", element) for every IfcProduct.
+
+    Removed, modified and unchanged elements come in ``old_path`` file order, added ones in
+    ``new_path`` order after them. Unchanged elements are yielded as ElementSummary.
+    """
+    with StepReader(old_path) as old_reader, StepReader(new_path) as new_reader:
+        old, new = _Fingerprinter(old_reader), _Fingerprinter(new_reader)
+        for global_id, (old_id, _) in old_reader.products.items():
+            before = _element(old, old_id)
+            match = new_reader.products.get(global_id)
+            if match is None:
+                yield "removed", ElementSummary(global_id, before.type, before.name)
+                continue
+            after = _element(new, match[0])
+            aspects = [aspect for aspect in ("type", "attributes", "placement", "geometry")
+                       if getattr(before, aspect) != getattr(after, aspect)]
+            if not aspects:
+                yield "unchanged", ElementSummary(global_id, after.type, after.name)
+                continue
+            yield "modified", ElementChange(global_id, after.type, after.name, aspects,
+                                            _changes(old, new, old_id, match[0], aspects))
+        for global_id, (new_id, _) in new_reader.products.items():
+            if global_id not in old_reader.products:
+                after = _element(new, new_id)
+                yield "added", ElementSummary(global_id, after.type, after.name)
+
+
+@logged
+def diff_files(old_path: str, new_path: str) -> ModelDiff:
+    """Elements added, removed and modified between two IFC files, matched by GlobalId.
+
+    Only elements that keep their GlobalId are matched. The builders of this service assign
+    new GlobalIds on every build, so two builds of the same member list share no elements:
+    everything shows up as removed and added. Raises ValueError if either file is not a readable IFC-SPF file.
+    """
+    diff = ModelDiff()
+    for status, element in iter_diff(old_path, new_path):
+        if status == "unchanged":
+            diff.unchanged += 1
+        else:
+            getattr(diff, status).append(element)
+    return diff
@@ -0,0 +1,329 @@
+import concurrent.futures
+import json
+import math
+import multiprocessing
+import os
+import threading
+import uuid
+from abc import ABC, abstractmethod
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+import ifcopenshell
+import ifcopenshell.guid
+import ifcopenshell.util.element
+import ifcopenshell.util.placement
+
+from services.model_compactor import compact_model
+
+# Partitions that start a worker pool instead of being written in-process
+MIN_PARTITIONS_FOR_WORKERS = 2
+# Elements below which the pool's startup and the extra parse cost more than they save
+MIN_ELEMENTS_FOR_WORKERS = 5000
+# Size of the worker pool shared by all saves, unless IFC_PARTITION_WORKERS says otherwise.
+# Every worker parses the whole model, so this also caps the memory a save takes on top of
+# what admission reserved for it.
+MAX_PARTITION_WORKERS = 4
+
+UNASSIGNED = "unassigned"
+
+
+class Partitioning(ABC):
+    """Assigns every element of a model to a partition key"""
+    uses_location = False
+
+    @abstractmethod
+    def key(self, storey: Optional[ifcopenshell.entity_instance],
+            location: Optional[Tuple[float, float, float]]) -> str: pass
+
+    @abstractmethod
+    def describe(self) -> Dict: pass
+
+
+class StoreyPartitioning(Partitioning):
+    """One partition per building storey; uncontained elements go to ``unassigned``"""
+
+    def key(self, storey, location) -> str:
+        return storey.GlobalId if storey is not None else UNASSIGNED
+
+    def describe(self) -> Dict:
+        return {"mode": "storey"}
+
+
+class TilePartitioning(Partitioning):
+    """One partition per ``size`` x ``size`` tile of the XY plane, by element placement"""
+    uses_location = True
+
+    def __init__(self, size: float):
+        if size <= 0:
+            raise ValueError("Tile size must be positive")
+        self.size = size
+
+    def key(self, storey, location) -> str:
+        x, y, _ = location or (0.0, 0.0, 0.0)
+        return f"x{math.floor(x / self.size)}_y{math.floor(y / self.size)}"
+
+    def describe(self) -> Dict:
+        return {"mode": "tile", "size": self.size}
+
+
+@dataclass(slots=True)
+class PartitionSpec:
+    key: str
+    storey_ids: List[int] = field(default_factory=list)
+    element_ids: List[int] = field(default_factory=list)
+
+
+@dataclass(slots=True)
+class PartitionResult:
+    entities: int
+    bytes_written: int
+
+
+def _derived_guid(guid: str, key: str) -> str:
+    """Stable GlobalId for the ``key`` partition's share of a relationship"""
+    return ifcopenshell.guid.compress(uuid.uuid5(uuid.NAMESPACE_OID, f"{guid}/{key}").hex)
+
+
+def plan_partitions(model: ifcopenshell.file, partitioning: Partitioning) -> List[PartitionSpec]:
+    """Group the model's elements by partition key, in order of first appearance"""
+    containers: Dict[int, ifcopenshell.entity_instance] = {}
+    for rel in model.by_type("IfcRelContainedInSpatialStructure"):
+        for element in rel.RelatedElements:
+            containers[element.id()] = rel.RelatingStructure
+
+    specs: Dict[str, PartitionSpec] = {}
+    placements: Dict[int, object] = {}
+    for element in model.by_type("IfcElement"):
+        storey = containers.get(element.id())
+        location = None
+        if partitioning.uses_location and element.ObjectPlacement is not None:
+            matrix = _placement_matrix(element.ObjectPlacement, placements)
+            location = (float(matrix[0][3]), float(matrix[1][3]), float(matrix[2][3]))
+        key = partitioning.key(storey, location)
+        spec = specs.setdefault(key, PartitionSpec(key))
+        if storey is not None and storey.id() not in spec.storey_ids:
+            spec.storey_ids.append(storey.id())
+        spec.element_ids.append(element.id())
+    return list(specs.values())
+
+
+def _placement_matrix(placement: ifcopenshell.entity_instance, cache: Dict[int, object]):
+    """Absolute 4x4 matrix of ``placement``; parent placements shared by many elements are resolved once"""
+    matrix = cache.get(placement.id())
+    if matrix is None:
+        if not placement.is_a("IfcLocalPlacement"):
+            matrix = ifcopenshell.util.placement.get_local_placement(placement)
+        else:
+            matrix = ifcopenshell.util.placement.get_axis2placement(placement.RelativePlacement)
+            if placement.PlacementRelTo is not None:
+                matrix = _placement_matrix(placement.PlacementRelTo, cache) @ matrix
+        cache[placement.id()] = matrix
+    return matrix
+
+
+def _spatial_ancestors(instance: ifcopenshell.entity_instance, found: Set[int]) -> None:
+    while instance is not None and instance.id() not in found:
+        found.add(instance.id())
+        instance = ifcopenshell.util.element.get_aggregate(instance)
+
+
+def _partitioned(instance: ifcopenshell.entity_instance) -> bool:
+    """Objects that belong to particular partitions; types, property sets etc. go wherever they are used"""
+    return instance.is_a("IfcProduct") or instance.is_a("IfcProject")
+
+
+def _copy_relationship(target: ifcopenshell.file, rel: ifcopenshell.entity_instance, keep: Set[int],
+                       key: str) -> None:
+    """Copy ``rel`` restricted to the objects in ``keep``; skipped if a relating side is missing"""
+    attributes = rel.get_info(recursive=False, include_identifier=False)
+    filtered = False
+    for name, value in attributes.items():
+        if isinstance(value, ifcopenshell.entity_instance) and _partitioned(value):
+            if value.id() not in keep:
+                return
+        elif isinstance(value, tuple) and value and isinstance(value[0], ifcopenshell.entity_instance):
+            kept = tuple(item for item in value if not _partitioned(item) or item.id() in keep)
+            if not kept:
+                return
+            if len(kept) != len(value):
+                attributes[name] = kept
+                filtered = True
+    if not filtered:
+        target.add(rel)
+        return
+    # The partition only carries part of the relationship, so it gets its own GlobalId
+    attributes["GlobalId"] = _derived_guid(rel.GlobalId, key)
+    del attributes["type"]
+    target.create_entity(rel.is_a(), **{name: _add_value(target, value) for name, value in attributes.items()})
+
+
+def _add_value(target: ifcopenshell.file, value):
+    if isinstance(value, ifcopenshell.entity_instance):
+        return target.add(value) if value.id() else value
+    if isinstance(value, tuple):
+        return tuple(_add_value(target, item) for item in value)
+    return value
+
+
+def extract_partition(source: ifcopenshell.file, spec: PartitionSpec) -> ifcopenshell.file:
+    """Self-contained model of the spec's elements, their storeys and the spatial skeleton above them"""
+    target = ifcopenshell.file(schema=source.wrapped_data.schema)
+    keep: Set[int] = set()
+    for project in source.by_type("IfcProject"):
+        target.add(project)
+        keep.add(project.id())
+    for storey_id in spec.storey_ids:
+        _spatial_ancestors(source.by_id(storey_id), keep)
+    spatial = set(keep)
+    keep.update(spec.element_ids)
+
+    relationships: Dict[int, ifcopenshell.entity_instance] = {}
+    for instance_id in sorted(spatial) + spec.element_ids:
+        instance = source.by_id(instance_id)
+        target.add(instance)
+        for rel in source.get_inverse(instance):
+            if rel.is_a("IfcRelationship"):
+                relationships.setdefault(rel.id(), rel)
+    for rel in relationships.values():
+        _copy_relationship(target, rel, keep, spec.key)
+    return target
+
+
+def _write(model: ifcopenshell.file, target_path: str, compact: bool) -> PartitionResult:
+    if compact:
+        model, _ = compact_model(model)
+    model.write(target_path)
+    return PartitionResult(len(model.wrapped_data.entity_names()), os.path.getsize(target_path))
+
+
+def _write_partitions_from_file(source_path: str, specs: List[PartitionSpec], targets: List[str],
+                                compact: bool) -> List[PartitionResult]:
+    """Worker entry point: parse the source model once and write a share of the partitions"""
+    source = ifcopenshell.open(source_path)
+    return [_write(extract_partition(source, spec), target, compact) for spec, target in zip(specs, targets)]
+
+
+def _shares(specs: List[PartitionSpec], count: int) -> List[List[int]]:
+    """Spec indices split into ``count`` shares of about equal element count, largest first"""
+    shares: List[List[int]] = [[] for _ in range(count)]
+    sizes = [0] * count
+    for index in sorted(range(len(specs)), key=lambda index: -len(specs[index].element_ids)):
+        lightest = sizes.index(min(sizes))
+        shares[lightest].append(index)
+        sizes[lightest] += len(specs[index].element_ids)
+    return [share for share in shares if share]
+
+
+_executor: Optional[concurrent.futures.ProcessPoolExecutor] = None
+_executor_workers = 0
+# Held by the one save using the pool; saves running meanwhile write their partitions in-process
+_executor_lock = threading.Lock()
+
+
+def _get_executor(workers: int) -> concurrent.futures.ProcessPoolExecutor:
+    global _executor, _executor_workers
+    if _executor is not None and _executor_workers != workers:
+        _executor.shutdown()
+        _executor = None
+    if _executor is None:
+        # spawn: forking a process that runs an event loop and worker threads is unsafe
+        _executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        _executor_workers = workers
+    return _executor
+
+
+def shutdown_workers() -> None:
+    """Stop the shared partition worker pool; it is started again on demand"""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(cancel_futures=True)
+            _executor = None
+
+
+def _write_in_workers(model: ifcopenshell.file, source_path: str, specs: List[PartitionSpec], targets: List[str],
+                      compact: bool, workers: int) -> List[PartitionResult]:
+    """Write the partitions in the shared pool; the caller holds ``_executor_lock``"""
+    global _executor
+    model.write(source_path)
+    try:
+        shares = _shares(specs, min(workers, len(specs)))
+        executor = _get_executor(workers)
+        futures = [executor.submit(_write_partitions_from_file, source_path, [specs[index] for index in share],
+                                   [targets[index] for index in share], compact)
+                   for share in shares]
+        # Let every worker finish with the source file before it is removed
+        concurrent.futures.wait(futures)
+        results: List[Optional[PartitionResult]] = [None] * len(specs)
+        for share, future in zip(shares, futures):
+            for index, result in zip(share, future.result()):
+                results[index] = result
+        return results
+    except concurrent.futures.process.BrokenProcessPool:
+        _executor = None
+        raise
+    finally:
+        os.remove(source_path)
+
+
+def write_partitions(model: ifcopenshell.file, file_path: str, partitioning: Partitioning,
+                     compact: bool = False, workers: Optional[int] = None) -> str:
+    """Write one IFC per partition next to ``file_path`` and a manifest; returns the manifest path.
+
+    ``model.ifc`` becomes ``model.part000.ifc``, ``model.part001.ifc``, ... and
+    ``model.manifest.json``. Large models are split by a pool of ``workers`` processes
+    (IFC_PARTITION_WORKERS, at most MAX_PARTITION_WORKERS by default) that each parse the
+    full model once: ifcopenshell holds the GIL while it serializes, so threads would write
+    the partitions one after another. The pool is shared and used by one save at a time,
+    so concurrent saves never hold more than ``workers`` extra copies of a model.
+    """
+    base = Path(file_path)
+    stem = base.with_suffix("")
+    specs = plan_partitions(model, partitioning)
+    targets = [f"{stem}.part{index:03d}.ifc" for index in range(len(specs))]
+
+    workers = workers or int(os.environ.get("IFC_PARTITION_WORKERS",
+                                            min(os.cpu_count() or 1, MAX_PARTITION_WORKERS)))
+    element_count = sum(len(spec.element_ids) for spec in specs)
+    if (min(workers, len(specs)) < MIN_PARTITIONS_FOR_WORKERS or element_count < MIN_ELEMENTS_FOR_WORKERS
+            or not _executor_lock.acquire(blocking=False)):
+        results = [_write(extract_partition(model, spec), target, compact) for spec, target in zip(specs, targets)]
+    else:
+        try:
+            results = _write_in_workers(model, f"{stem}.source.ifc", specs, targets, compact, workers)
+        finally:
+            _executor_lock.release()
+
+    manifest_path = f"{stem}.manifest.json"
+    Path(manifest_path).write_text(json.dumps(_manifest(model, partitioning, specs, targets, results), indent=2))
+    return manifest_path
+
+
+def _manifest(model: ifcopenshell.file, partitioning: Partitioning, specs: List[PartitionSpec],
+              targets: List[str], results: List[PartitionResult]) -> Dict:
+    def named(instance):
+        return {"GlobalId": instance.GlobalId, "Name": instance.Name}
+
+    partitions = []
+    for spec, target, result in zip(specs, targets, results):
+        partitions.append({
+            "file": Path(target).name,
+            "key": spec.key,
+            "storeys": [named(model.by_id(storey_id)) for storey_id in spec.storey_ids],
+            "elements": len(spec.element_ids),
+            "element_types": dict(Counter(model.by_id(element_id).is_a() for element_id in spec.element_ids)),
+            "entities": result.entities,
+            "bytes": result.bytes_written,
+        })
+    return {
+        "schema": model.wrapped_data.schema,
+        "partitioning": partitioning.describe(),
+        "projects": [named(project) for project in model.by_type("IfcProject")],
+        "sites": [named(site) for site in model.by_type("IfcSite")],
+        "buildings": [named(building) for building in model.by_type("IfcBuilding")],
+        "partitions": partitions,
+    }
@@ -0,0 +1,198 @@
+import asyncio
+import contextlib
+import heapq
+import itertools
+import os
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from enum import Enum
+from typing import AsyncIterator, Callable, Deque, Dict, List, Optional, TypeVar
+
+from core.structured_log import get_logger
+
+T = TypeVar("T")
+
+log = get_logger(__name__)
+
+
+class Lane(str, Enum):
+    INTERACTIVE = "interactive"
+    BULK = "bulk"
+
+
+@dataclass(order=True, slots=True)
+class _Job:
+    # Shortest job first, FIFO among equal sizes
+    element_count: int
+    sequence: int
+    lane: Lane = field(compare=False)
+    enqueued_at: float = field(compare=False)
+    granted: asyncio.Future = field(compare=False)
+
+
+@dataclass(slots=True)
+class _LaneState:
+    queue: List[_Job] = field(default_factory=list)
+    running: int = 0
+    completed: int = 0
+    waits: Deque[float] = field(default_factory=lambda: deque(maxlen=1000))
+
+
+class SlotUnavailable(Exception):
+    """The lane's queue is full, or no slot was granted within the queue timeout"""
+
+
+def _percentile(values: List[float], fraction: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+class GenerationScheduler:
+    """Hands out build slots by lane: small (interactive) requests and bulk builds.
+
+    Within a lane, the job with the fewest estimated elements runs first.
+    ``reserved_interactive`` of the ``workers`` slots are never given to bulk builds, so a
+    single-beam request does not wait behind large exports. Interactive jobs are otherwise
+    preferred, but a bulk job that has waited ``max_bulk_wait`` seconds takes the next
+    slot open to bulk, and aged bulk jobs are served oldest first.
+
+    At most ``max_queue`` jobs wait per lane, each for at most ``queue_timeout`` seconds;
+    beyond that ``slot`` raises SlotUnavailable, so waiting requests stay bounded.
+    """
+
+    def __init__(self, workers: int = 4, reserved_interactive: int = 1, interactive_max_elements: int = 50,
+                 max_bulk_wait: float = 10.0, max_queue: int = 64, queue_timeout: Optional[float] = 30.0):
+        if not 0 <= reserved_interactive < workers:
+            raise ValueError("reserved_interactive must leave at least one worker for bulk builds")
+        self.workers = workers
+        self.reserved_interactive = reserved_interactive
+        self.interactive_max_elements = interactive_max_elements
+        self.max_bulk_wait = max_bulk_wait
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._lanes: Dict[Lane, _LaneState] = {lane: _LaneState() for lane in Lane}
+        self._sequence = itertools.count()
+
+    @classmethod
+    def from_environment(cls) -> 'GenerationScheduler':
+        """Configured by IFC_SCHEDULER_WORKERS, IFC_SCHEDULER_RESERVED_INTERACTIVE,
+        IFC_INTERACTIVE_MAX_ELEMENTS, IFC_BULK_MAX_WAIT, IFC_SCHEDULER_MAX_QUEUE and
+        IFC_SCHEDULER_QUEUE_TIMEOUT"""
+        return cls(
+            # At least two workers so the reserved interactive slot does not starve bulk builds
+            workers=int(os.environ.get("IFC_SCHEDULER_WORKERS", max(os.cpu_count() or 4, 2))),
+            reserved_interactive=int(os.environ.get("IFC_SCHEDULER_RESERVED_INTERACTIVE", "1")),
+            interactive_max_elements=int(os.environ.get("IFC_INTERACTIVE_MAX_ELEMENTS", "50")),
+            max_bulk_wait=float(os.environ.get("IFC_BULK_MAX_WAIT", "10")),
+            max_queue=int(os.environ.get("IFC_SCHEDULER_MAX_QUEUE", "64")),
+            queue_timeout=float(os.environ.get("IFC_SCHEDULER_QUEUE_TIMEOUT", "30")),
+        )
+
+    def lane_for(self, element_count: Optional[int]) -> Lane:
+        """Unknown sizes (None) go to the bulk lane"""
+        if element_count is not None and element_count <= self.interactive_max_elements:
+            return Lane.INTERACTIVE
+        return Lane.BULK
+
+    @contextlib.asynccontextmanager
+    async def slot(self, element_count: Optional[int]) -> AsyncIterator[Lane]:
+        """Wait for a build slot in the request's lane and hold it for the block"""
+        lane = self.lane_for(element_count)
+        if len(self._lanes[lane].queue) >= self.max_queue:
+            log.warning("scheduler.rejected", reason="queue_full", lane=lane.value, elements=element_count)
+            raise SlotUnavailable(f"Too many {lane.value} builds waiting for a slot")
+        job = _Job(element_count if element_count is not None else 2 ** 62, next(self._sequence), lane,
+                   time.monotonic(), asyncio.get_running_loop().create_future())
+        heapq.heappush(self._lanes[lane].queue, job)
+        self._dispatch()
+        try:
+            await asyncio.wait_for(job.granted, self.queue_timeout)
+        except (asyncio.CancelledError, asyncio.TimeoutError) as exc:
+            if job.granted.cancelled():
+                if job in self._lanes[lane].queue:
+                    self._remove(job)
+            else:
+                self._release(lane)
+            if isinstance(exc, asyncio.TimeoutError):
+                log.warning("scheduler.rejected", reason="timeout", lane=lane.value, elements=element_count)
+                raise SlotUnavailable(f"No {lane.value} slot became free within {self.queue_timeout}s") from None
+            raise
+
+        try:
+            yield lane
+        finally:
+            self._lanes[lane].completed += 1
+            self._release(lane)
+
+    async def run(self, element_count: Optional[int], func: Callable[..., T], *args) -> T:
+        """Run the blocking ``func(*args)`` in a worker thread once a slot is free"""
+        async with self.slot(element_count):
+            return await asyncio.to_thread(func, *args)
+
+    def _release(self, lane: Lane) -> None:
+        self._lanes[lane].running -= 1
+        self._dispatch()
+
+    def _remove(self, job: _Job) -> None:
+        queue = self._lanes[job.lane].queue
+        queue.remove(job)
+        heapq.heapify(queue)
+
+    def _running(self) -> int:
+        return sum(state.running for state in self._lanes.values())
+
+    def _next_job(self) -> Optional[_Job]:
+        interactive = self._lanes[Lane.INTERACTIVE]
+        bulk = self._lanes[Lane.BULK]
+        bulk_allowed = bool(bulk.queue) and bulk.running < self.workers - self.reserved_interactive
+
+        if bulk_allowed:
+            oldest = min(bulk.queue, key=lambda job: job.enqueued_at)
+            if time.monotonic() - oldest.enqueued_at >= self.max_bulk_wait:
+                self._remove(oldest)
+                return oldest
+        if interactive.queue:
+            return heapq.heappop(interactive.queue)
+        if bulk_allowed:
+            return heapq.heappop(bulk.queue)
+        return None
+
+    def _dispatch(self) -> None:
+        while self._running() < self.workers:
+            job = self._next_job()
+            if job is None:
+                return
+            if job.granted.done():
+                # Waiter was cancelled and has not removed itself yet
+                continue
+            state = self._lanes[job.lane]
+            state.running += 1
+            state.waits.append(time.monotonic() - job.enqueued_at)
+            job.granted.set_result(None)
+
+    def stats(self) -> Dict:
+        now = time.monotonic()
+        lanes = {}
+        for lane, state in self._lanes.items():
+            waits = list(state.waits)
+            lanes[lane.value] = {
+                "queued": len(state.queue),
+                "running": state.running,
+                "completed": state.completed,
+                "oldest_queued_s": max((now - job.enqueued_at for job in state.queue), default=0.0),
+                "wait_p50_s": _percentile(waits, 0.50),
+                "wait_p95_s": _percentile(waits, 0.95),
+                "wait_max_s": max(waits, default=None),
+            }
+        return {
+            "workers": self.workers,
+            "reserved_interactive": self.reserved_interactive,
+            "interactive_max_elements": self.interactive_max_elements,
+            "max_bulk_wait_s": self.max_bulk_wait,
+            "max_queue": self.max_queue,
+            "queue_timeout_s": self.queue_timeout,
+            "lanes": lanes,
+        }
@@ -0,0 +1,158 @@
+import asyncio
+import concurrent.futures
+import multiprocessing
+import os
+import pickle
+import uuid
+import zipfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Sequence
+
+from models.dto.beam_dto import BeamDTO
+from services.build_progress import BuildProgress
+from services.ifc_model_manager import OUTPUT_DIR
+from services.ifc_model_manager_factory import IfcModelManagerFactory, create_beams_model
+
+SUPPORTED_SCHEMAS = ("IFC2X3", "IFC4", "IFC4X3")
+
+
+@dataclass(slots=True)
+class SchemaArtifact:
+    schema: str
+    path: str
+    entities: int
+
+
+def normalize_schemas(schemas: Iterable[str]) -> List[str]:
+    """Upper-cased, de-duplicated target schemas in request order; ValueError for unknown ones"""
+    normalized = list(dict.fromkeys(schema.upper() for schema in schemas))
+    if not normalized:
+        raise ValueError("At least one schema is required")
+    for schema in normalized:
+        IfcModelManagerFactory.create_manager(schema)
+    return normalized
+
+
+def _build(beams: Sequence[BeamDTO], schema: str, compact: bool) -> SchemaArtifact:
+    """Build one schema's model from already prepared DTOs"""
+    progress = BuildProgress(elements_total=len(beams))
+    path = create_beams_model(beams, schema, progress, compact)
+    return SchemaArtifact(schema, path, progress.entities)
+
+
+def _build_pickled(beams: bytes, schema: str, compact: bool) -> SchemaArtifact:
+    """Worker entry point; the DTOs arrive pickled once per request rather than once per schema"""
+    return _build(pickle.loads(beams), schema, compact)
+
+
+def _discard_artifact(future) -> None:
+    if not future.cancelled() and future.exception() is None:
+        Path(future.result().path).unlink(missing_ok=True)
+
+
+def write_archive(artifacts: Sequence[SchemaArtifact], archive_path: Optional[str] = None) -> str:
+    """Zip the artifacts as ``<schema>.ifc`` entries and remove the individual files"""
+    if archive_path is None:
+        OUTPUT_DIR.mkdir(exist_ok=True)
+        archive_path = str(OUTPUT_DIR / f"{uuid.uuid4()}.zip")
+    with zipfile.ZipFile(archive_path, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for artifact in artifacts:
+            archive.write(artifact.path, arcname=f"{artifact.schema.lower()}.ifc")
+    for artifact in artifacts:
+        os.remove(artifact.path)
+    return archive_path
+
+
+class SchemaFanOut:
+    """Builds one model per target schema in parallel worker processes.
+
+    Model construction holds the GIL for most of its time, so schemas built on threads
+    take the sum of their build times; with a core per schema, separate processes can
+    bring that down to the slowest schema. Shipping the DTOs and the result costs more
+    than it saves without spare cores, so with one worker or one CPU the schemas are built
+    one after another in a thread instead. The pool is started on first use and kept for
+    later requests.
+    """
+
+    def __init__(self, workers: int = len(SUPPORTED_SCHEMAS)):
+        self.workers = workers
+        self._executor: Optional[concurrent.futures.ProcessPoolExecutor] = None
+
+    @classmethod
+    def from_environment(cls) -> 'SchemaFanOut':
+        """Configured by IFC_FANOUT_WORKERS"""
+        return cls(workers=int(os.environ.get("IFC_FANOUT_WORKERS", len(SUPPORTED_SCHEMAS))))
+
+    def _get_executor(self) -> concurrent.futures.ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: forking a process that runs an event loop and worker threads is unsafe
+            self._executor = concurrent.futures.ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    @property
+    def in_process(self) -> bool:
+        return self.workers < 2 or (os.cpu_count() or 1) < 2
+
+    async def build(self, beams: Sequence[BeamDTO], schemas: Sequence[str],
+                    compact: bool = False) -> List[SchemaArtifact]:
+        """Build ``beams`` in every schema; artifacts are returned in ``schemas`` order"""
+        if self.in_process:
+            return await self._build_in_process(list(beams), schemas, compact)
+
+        executor = self._get_executor()
+        pickled = pickle.dumps(list(beams), protocol=pickle.HIGHEST_PROTOCOL)
+        submitted = [executor.submit(_build_pickled, pickled, schema, compact) for schema in schemas]
+        try:
+            results = await asyncio.gather(*(asyncio.wrap_future(future) for future in submitted),
+                                           return_exceptions=True)
+        except asyncio.CancelledError:
+            # Builds already running cannot be stopped; drop their files once they finish
+            for future in submitted:
+                future.add_done_callback(_discard_artifact)
+            raise
+
+        errors = [result for result in results if isinstance(result, BaseException)]
+        if errors:
+            for future in submitted:
+                _discard_artifact(future)
+            if isinstance(errors[0], concurrent.futures.process.BrokenProcessPool):
+                self._executor = None
+            raise errors[0]
+        return results
+
+    @staticmethod
+    async def _build_in_process(beams: List[BeamDTO], schemas: Sequence[str],
+                                compact: bool) -> List[SchemaArtifact]:
+        artifacts: List[SchemaArtifact] = []
+        try:
+            for schema in schemas:
+                task = asyncio.ensure_future(asyncio.to_thread(_build, beams, schema, compact))
+                try:
+                    artifacts.append(await asyncio.shield(task))
+                except asyncio.CancelledError:
+                    # The thread cannot be stopped; drop its file once it finishes
+                    task.add_done_callback(_discard_artifact)
+                    raise
+        except BaseException:
+            for artifact in artifacts:
+                Path(artifact.path).unlink(missing_ok=True)
+            raise
+        return artifacts
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+
+def build_schemas(beams: Sequence[BeamDTO], schemas: Sequence[str], compact: bool = False,
+                  workers: Optional[int] = None) -> Dict[str, SchemaArtifact]:
+    """Blocking one-shot fan-out, e.g. for scripts and benchmarks"""
+    fan_out = SchemaFanOut(workers or len(schemas))
+    try:
+        artifacts = asyncio.run(fan_out.build(beams, normalize_schemas(schemas), compact))
+    finally:
+        fan_out.shutdown()
+    return {artifact.schema: artifact for artifact in artifacts}
@@ -4,6 +4,7 @@ import ifcopenshell.guid
 from core.cartesian_point import CartesianPoint
 from models.dto.beam_dto import BeamDTO
 from services.strategies.building_element_creator import IfcBuildingElementCreator
+from services.strategies.entity_constructors import IfcEntityConstructors
 
 
 class IfcBeamCreator(IfcBuildingElementCreator):
@@ -12,6 +13,7 @@ class IfcBeamCreator(IfcBuildingElementCreator):
         self._beam_properties = properties
 
     def create_element(self, model: ifcopenshell.file,
+                       entities: IfcEntityConstructors,
                        context: ifcopenshell.entity_instance,
                        owner_history: ifcopenshell.entity_instance,
                        storey: ifcopenshell.entity_instance) -> ifcopenshell.entity_instance:
@@ -19,11 +21,12 @@ class IfcBeamCreator(IfcBuildingElementCreator):
 
         object_placement = self._create_local_placement(
             model,
+            entities,
             storey.ObjectPlacement,
             location=tuple(self._beam_properties.building_element.location)
         )
 
-        shape_3d = self._create_beam_shape(model, context,
+        shape_3d = self._create_beam_shape(model, entities, context,
                                            self._beam_properties.width,
                                            self._beam_properties.height,
                                            self._beam_properties.length)
@@ -79,8 +82,8 @@ class IfcBeamCreator(IfcBuildingElementCreator):
         #     ]
         # )
 
-        beam = model.create_entity(
-            "IfcBeam",
+        beam = entities.IfcBeam(
+            model,
             GlobalId=ifcopenshell.guid.new(),
             OwnerHistory=owner_history,
             Name=self._beam_properties.building_element.name,
@@ -88,65 +91,43 @@ class IfcBeamCreator(IfcBuildingElementCreator):
             Representation=shape_3d  # merged_shape
         )
 
-        # --- Add to spatial structure ---
-        self._find_or_create_containment_relationship(model, owner_history, storey, beam)
-
         return beam
 
-    @staticmethod
-    def _find_or_create_containment_relationship(model, owner_history, storey, element):
-        for rel in model.by_type("IfcRelContainedInSpatialStructure"):
-            if rel.RelatingStructure == storey:
-                # Existing relationship found, add the element to it
-                # rel.RelatedElements.append(element)
-                related_elements = list(rel.RelatedElements)
-                related_elements.append(element)
-                rel.RelatedElements = related_elements
-                return rel
-
-        return model.create_entity(
-            "IfcRelContainedInSpatialStructure",
-            GlobalId=ifcopenshell.guid.new(),
-            OwnerHistory=owner_history,
-            RelatingStructure=storey,
-            RelatedElements=[element]
-        )
-
-    def _create_beam_shape(self, model, context, width, height, length):
+    def _create_beam_shape(self, model, entities, context, width, height, length):
         """Create shape representation for a beam"""
-        axis2placement2d = self._create_axis_2_placement_2d(model)
+        axis2placement2d = self._create_axis_2_placement_2d(model, entities)
 
         # Create profile and solid
-        profile = self._create_rectangle_profile_def(axis2placement2d, height, model, width)
+        profile = self._create_rectangle_profile_def(axis2placement2d, height, model, entities, width)
 
-        axis2placement3d = self._create_local_placement(model)
-        direction_z = model.create_entity("IfcDirection", DirectionRatios=(0.0, 0.0, 1.0))
+        axis2placement3d = self._create_local_placement(model, entities)
+        direction_z = entities.IfcDirection(model, DirectionRatios=(0.0, 0.0, 1.0))
 
-        extruded = model.create_entity(
-            "IfcExtrudedAreaSolid",
+        extruded = entities.IfcExtrudedAreaSolid(
+            model,
             SweptArea=profile,
             Depth=length,
             ExtrudedDirection=direction_z,
             Position=axis2placement3d.RelativePlacement
         )
 
-        body_rep = model.create_entity(
-            "IfcShapeRepresentation",
+        body_rep = entities.IfcShapeRepresentation(
+            model,
             ContextOfItems=context,
             RepresentationIdentifier="Body",
             RepresentationType="SweptSolid",
             Items=[extruded]
         )
 
-        return model.create_entity(
-            "IfcProductDefinitionShape",
+        return entities.IfcProductDefinitionShape(
+            model,
             Representations=[body_rep]
         )
 
     @staticmethod
-    def _create_rectangle_profile_def(axis2placement2d, height, model, width):
-        profile = model.create_entity(
-            "IfcRectangleProfileDef",
+    def _create_rectangle_profile_def(axis2placement2d, height, model, entities, width):
+        profile = entities.IfcRectangleProfileDef(
+            model,
             ProfileType="AREA",
             XDim=width,
             YDim=height,
@@ -154,11 +135,11 @@ class IfcBeamCreator(IfcBuildingElementCreator):
         )
         return profile
 
-    def _create_axis_2_placement_2d(self, model):
-        origin = self._create_cartesian_point(CartesianPoint(0.0, 0.0, 0.0), model)
-        ref_dir_2d = model.create_entity("IfcDirection", DirectionRatios=(1.0, 0.0))
-        axis2placement2d = model.create_entity(
-            "IfcAxis2Placement2D",
+    def _create_axis_2_placement_2d(self, model, entities):
+        origin = self._create_cartesian_point(CartesianPoint(0.0, 0.0, 0.0), model, entities)
+        ref_dir_2d = entities.IfcDirection(model, DirectionRatios=(1.0, 0.0))
+        axis2placement2d = entities.IfcAxis2Placement2D(
+            model,
             Location=origin,
             RefDirection=ref_dir_2d
         )
@@ -4,6 +4,7 @@ from typing import Optional
 import ifcopenshell
 
 from core.cartesian_point import CartesianPoint
+from services.strategies.entity_constructors import IfcEntityConstructors
 
 
 class IfcBuildingElementCreator(abc.ABC):
@@ -11,6 +12,7 @@ class IfcBuildingElementCreator(abc.ABC):
 
     @abc.abstractmethod
     def create_element(self, model: ifcopenshell.file,
+                       entities: IfcEntityConstructors,
                        context: ifcopenshell.entity_instance,
                        owner_history: ifcopenshell.entity_instance
                        , storey: ifcopenshell.entity_instance
@@ -19,37 +21,38 @@ class IfcBuildingElementCreator(abc.ABC):
 
     @staticmethod
     def _create_local_placement(model: ifcopenshell.file,
+                                entities: IfcEntityConstructors,
                                 parent_placement: Optional[ifcopenshell.entity_instance] = None,
                                 location: tuple = (0.0, 0.0, 0.0),
                                 axis: tuple = (0.0, 0.0, 1.0),
                                 ref_direction: tuple = (1.0, 0.0, 0.0)) -> ifcopenshell.entity_instance:
         """Create a standard placement for an element"""
-        origin = IfcBuildingElementCreator._create_cartesian_point(location, model)
-        z_axis = IfcBuildingElementCreator._create_direction(axis, model)
-        x_axis = IfcBuildingElementCreator._create_direction(ref_direction, model)
+        origin = IfcBuildingElementCreator._create_cartesian_point(location, model, entities)
+        z_axis = IfcBuildingElementCreator._create_direction(axis, model, entities)
+        x_axis = IfcBuildingElementCreator._create_direction(ref_direction, model, entities)
 
-        axis_placement = IfcBuildingElementCreator._create_axis_2_placement_3d(model, origin, x_axis, z_axis)
+        axis_placement = IfcBuildingElementCreator._create_axis_2_placement_3d(model, entities, origin, x_axis, z_axis)
 
-        return model.create_entity(
-            "IfcLocalPlacement",
+        return entities.IfcLocalPlacement(
+            model,
             PlacementRelTo=parent_placement,
             RelativePlacement=axis_placement
         )
 
     @staticmethod
-    def _create_direction(axis, model):
-        z_axis = model.create_entity("IfcDirection", DirectionRatios=axis)
+    def _create_direction(axis, model, entities: IfcEntityConstructors):
+        z_axis = entities.IfcDirection(model, DirectionRatios=axis)
         return z_axis
 
     @staticmethod
-    def _create_cartesian_point(location: CartesianPoint, model):
-        origin = model.create_entity("IfcCartesianPoint", Coordinates=tuple(location))
+    def _create_cartesian_point(location: CartesianPoint, model, entities: IfcEntityConstructors):
+        origin = entities.IfcCartesianPoint(model, Coordinates=tuple(location))
         return origin
 
     @staticmethod
-    def _create_axis_2_placement_3d(model, origin, x_axis, z_axis):
-        axis_placement = model.create_entity(
-            "IfcAxis2Placement3D",
+    def _create_axis_2_placement_3d(model, entities: IfcEntityConstructors, origin, x_axis, z_axis):
+        axis_placement = entities.IfcAxis2Placement3D(
+            model,
             Location=origin,
             Axis=z_axis,
             RefDirection=x_axis
@@ -0,0 +1,101 @@
+import functools
+from typing import Any, Dict, Iterable, Mapping, Optional, Tuple
+
+import ifcopenshell
+from ifcopenshell import ifcopenshell_wrapper
+
+_entity_instance = ifcopenshell.entity_instance
+_wrapped_entity_instance = ifcopenshell_wrapper.entity_instance
+
+# Same aliasing ifcopenshell.file applies to its ``schema`` argument
+_SCHEMA_ALIASES = {"IFC4X3": "IFC4X3_ADD2"}
+
+
+def _resolve_setter(argument_type: str):
+    """Map an IfcOpenShell argument type (e.g. 'AGGREGATE OF DOUBLE') to its wrapper setter"""
+    method_name = "setArgumentAs" + argument_type.title().replace(" ", "")
+    method_name = method_name.replace("Binary", "String").replace("Enumeration", "String")
+    return getattr(_wrapped_entity_instance, method_name, None)
+
+
+class IfcEntityConstructor:
+    """Creates instances of a single IFC entity type.
+
+    Type name, attribute positions and attribute setters are resolved once when the
+    constructor is compiled, so a call only allocates the instance, writes the given
+    attributes by index and adds it to the model.
+    """
+    __slots__ = ("schema", "type_name", "_setters", "_defaults")
+
+    def __init__(self, schema: str, type_name: str, defaults: Optional[Mapping[str, Any]] = None):
+        schema = _SCHEMA_ALIASES.get(schema, schema)
+        declaration = ifcopenshell_wrapper.schema_by_name(schema).declaration_by_name(type_name)
+        attribute_names = [attribute.name() for attribute in declaration.all_attributes()]
+
+        self.schema = schema
+        self.type_name = declaration.name()
+        self._setters: Dict[str, Tuple[int, Any]] = {
+            name: (index, _resolve_setter(argument_type))
+            for index, (name, argument_type) in enumerate(zip(attribute_names, declaration.argument_types()))
+        }
+        self._defaults = dict(defaults or {})
+        self._check_attributes(self._defaults)
+
+    def __call__(self, model: ifcopenshell.file, **attributes) -> ifcopenshell.entity_instance:
+        if self._defaults:
+            attributes = {**self._defaults, **attributes}
+
+        wrapped = ifcopenshell_wrapper.new_IfcBaseClass(self.schema, self.type_name)
+        setters = self._setters
+        for name, value in attributes.items():
+            if value is None:
+                continue
+            try:
+                index, setter = setters[name]
+            except KeyError:
+                raise ValueError(f"entity instance of type '{self.type_name}' doesn't have the "
+                                 f"following attributes: {name}.") from None
+            if isinstance(value, _entity_instance):
+                value = value.wrapped_data
+            elif isinstance(value, (tuple, list)):
+                value = _entity_instance.unwrap_value(value)
+            setter(wrapped, index, value)
+
+        instance = _entity_instance(wrapped, model)
+        model.wrapped_data.add(wrapped, -1)
+        # The file now owns the instance, see ifcopenshell.file.create_entity
+        wrapped.this.disown()
+        if model.transaction:
+            model.transaction.store_create(instance)
+        return instance
+
+    def _check_attributes(self, names: Iterable[str]) -> None:
+        unknown = [name for name in names if name not in self._setters or self._setters[name][1] is None]
+        if unknown:
+            raise ValueError(f"entity instance of type '{self.type_name}' doesn't have the "
+                             f"following attributes: {', '.join(unknown)}.")
+
+    def __repr__(self) -> str:
+        return f"IfcEntityConstructor({self.schema!r}, {self.type_name!r})"
+
+
+class IfcEntityConstructors:
+    """Precompiled constructors for one schema, accessible by entity name (e.g. ``entities.IfcBeam``)"""
+
+    def __init__(self, schema: str, entity_types: Iterable[str],
+                 defaults: Optional[Mapping[str, Mapping[str, Any]]] = None):
+        self.schema = schema
+        defaults = defaults or {}
+        for type_name in entity_types:
+            constructor = IfcEntityConstructor(schema, type_name, defaults.get(type_name))
+            setattr(self, constructor.type_name, constructor)
+
+    def __getitem__(self, type_name: str) -> IfcEntityConstructor:
+        return getattr(self, type_name)
+
+
+@functools.lru_cache(maxsize=None)
+def compile_constructors(schema: str, entity_types: Tuple[str, ...],
+                         defaults: Tuple[Tuple[str, Tuple[Tuple[str, Any], ...]], ...] = ()) -> IfcEntityConstructors:
+    """Compile (once per schema and configuration) the constructors for ``entity_types``"""
+    return IfcEntityConstructors(schema, entity_types, {type_name: dict(values) for type_name, values in defaults})
@@ -4,7 +4,25 @@ from services.strategies.model_strategy import IfcModelStrategy
 class IFC2X3Strategy(IfcModelStrategy):
     """IFC2X3 implementation strategy"""
 
+    # Attributes that are mandatory in IFC2X3 but optional from IFC4 on
+    ENTITY_DEFAULTS = {
+        "IfcOwnerHistory": {"ChangeAction": "NOCHANGE"},
+        "IfcSite": {"CompositionType": "ELEMENT"},
+        "IfcBuilding": {"CompositionType": "ELEMENT"},
+        "IfcBuildingStorey": {"CompositionType": "ELEMENT"},
+    }
+
     def get_schema(self) -> str:
         return "IFC2X3"
 
-    def create_specific_entities(self, model_manager: 'IfcModelManager') -> None: pass
+    def create_specific_entities(self, model_manager: 'IfcModelManager') -> None:
+        """IfcProject.UnitsInContext is mandatory in IFC2X3, assign SI units"""
+        entities = model_manager.entities
+        model = model_manager.model
+        units = [
+            entities.IfcSIUnit(model, UnitType="LENGTHUNIT", Name="METRE"),
+            entities.IfcSIUnit(model, UnitType="AREAUNIT", Name="SQUARE_METRE"),
+            entities.IfcSIUnit(model, UnitType="VOLUMEUNIT", Name="CUBIC_METRE"),
+            entities.IfcSIUnit(model, UnitType="PLANEANGLEUNIT", Name="RADIAN"),
+        ]
+        model_manager.project.UnitsInContext = entities.IfcUnitAssignment(model, Units=units)
@@ -1,10 +1,49 @@
 from abc import ABC, abstractmethod
+from typing import Any, Mapping
+
+from services.strategies.entity_constructors import IfcEntityConstructors, compile_constructors
 
 
 class IfcModelStrategy(ABC):
+    # Entity types the model manager and the element creators instantiate
+    ENTITY_TYPES = (
+        "IfcApplication",
+        "IfcAxis2Placement2D",
+        "IfcAxis2Placement3D",
+        "IfcBeam",
+        "IfcBuilding",
+        "IfcBuildingStorey",
+        "IfcCartesianPoint",
+        "IfcDirection",
+        "IfcExtrudedAreaSolid",
+        "IfcGeometricRepresentationContext",
+        "IfcLocalPlacement",
+        "IfcOrganization",
+        "IfcOwnerHistory",
+        "IfcPerson",
+        "IfcPersonAndOrganization",
+        "IfcProductDefinitionShape",
+        "IfcProject",
+        "IfcRectangleProfileDef",
+        "IfcRelAggregates",
+        "IfcRelContainedInSpatialStructure",
+        "IfcShapeRepresentation",
+        "IfcSIUnit",
+        "IfcSite",
+        "IfcUnitAssignment",
+    )
+
+    # Schema specific default attribute values, keyed by entity type
+    ENTITY_DEFAULTS: Mapping[str, Mapping[str, Any]] = {}
 
     @abstractmethod
     def get_schema(self) -> str: pass
 
     @abstractmethod
-    def create_specific_entities(self, model_manager: 'IfcModelManager') -> None: pass
\ No newline at end of file
+    def create_specific_entities(self, model_manager: 'IfcModelManager') -> None: pass
+
+    def get_entity_constructors(self) -> IfcEntityConstructors:
+        """Constructors for ENTITY_TYPES, compiled once per schema"""
+        defaults = tuple(sorted((type_name, tuple(sorted(values.items())))
+                                for type_name, values in self.ENTITY_DEFAULTS.items()))
+        return compile_constructors(self.get_schema(), self.ENTITY_TYPES, defaults)
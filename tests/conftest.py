@@ -0,0 +1,15 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def output_dir(tmp_path, monkeypatch):
+    """Artifacts written without an explicit path go to the test's tmp_path, not generated/"""
+    import api.v1.ifc_routes
+    import services.ifc_creator
+    import services.ifc_model_manager
+    import services.schema_fan_out
+
+    directory = tmp_path / "generated"
+    for module in (services.ifc_creator, services.ifc_model_manager, services.schema_fan_out, api.v1.ifc_routes):
+        monkeypatch.setattr(module, "OUTPUT_DIR", directory)
+    return directory
@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+
+
+def _controller(budget_elements: int, **kwargs):
+    from services.admission import AdmissionController, CostModel, LinearCost, SchemaCost
+
+    cost = SchemaCost(entities=LinearCost(10, 20), memory_bytes=LinearCost(0, 1000), seconds=LinearCost(0, 0.001))
+    return AdmissionController(CostModel({"IFC4": cost}), memory_budget_bytes=budget_elements * 1000, **kwargs)
+
+
+def test_estimate_is_linear_in_element_count():
+    controller = _controller(100)
+    estimate = controller.estimate(50, "ifc4")
+    assert (estimate.entities, estimate.memory_bytes) == (1010, 50_000)
+    assert controller.estimate(None, "IFC4").memory_bytes == 100_000
+
+
+def test_oversized_request_is_rejected():
+    from services.admission import RequestTooLarge
+
+    async def admit():
+        async with _controller(100).admit(101, "IFC4"):
+            pass
+
+    with pytest.raises(RequestTooLarge):
+        asyncio.run(admit())
+
+
+def test_requests_queue_until_budget_is_released():
+    from services.admission import AdmissionRejected
+
+    controller = _controller(100, max_queue=1, queue_timeout=5)
+    order = []
+
+    async def build(name, elements):
+        async with controller.admit(elements, "IFC4") as ticket:
+            order.append(name)
+            await asyncio.sleep(0.01)
+            ticket.entities = 10 + 20 * elements
+
+    async def run():
+        return await asyncio.gather(build("first", 60), build("second", 60), build("third", 60),
+                                    return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert order == ["first", "second"]
+    assert isinstance(results[2], AdmissionRejected)
+    assert controller.reserved_bytes == 0
+    assert [record.actual.entities for record in controller.records] == [1210, 1210]
+
+
+def test_fit_recovers_linear_costs():
+    from services.admission import CostEstimate, CostModel, CostRecord
+
+    estimate = CostEstimate(0, 0, 0.0)
+    records = [CostRecord("IFC4", n, estimate, CostEstimate(25 + 19 * n, 1000 + 500 * n, 0.001 * n))
+               for n in (0, 100, 200)]
+    records.append(CostRecord("IFC4", 50, estimate, CostEstimate(None, 1000 + 500 * 50, 0.05)))
+    fitted = CostModel.fit(records).estimate(1000, "IFC4")
+
+    assert fitted.entities == 19025
+    assert fitted.memory_bytes == 501_000
+    assert fitted.seconds == pytest.approx(1.0)
+
+
+def test_memory_is_measured_per_build_and_skipped_when_builds_overlap():
+    controller = _controller(1000)
+    megabyte = 2 ** 20
+
+    async def build(megabytes, delay=0.0):
+        async with controller.admit(1, "IFC4"):
+            data = b"x" * (megabytes * megabyte)
+            await asyncio.sleep(delay)
+        return len(data)
+
+    async def run():
+        # A smaller build after a larger one is still measured, unlike peak RSS growth
+        for megabytes in (40, 8, 16):
+            await build(megabytes)
+        await asyncio.gather(build(8, 0.05), build(8, 0.05))
+
+    asyncio.run(run())
+    measured = [record.actual.memory_bytes for record in controller.records]
+    for value, megabytes in zip(measured, (40, 8, 16)):
+        assert megabytes * megabyte <= value < (megabytes + 20) * megabyte
+    assert measured[3:] == [None, None]
@@ -0,0 +1,81 @@
+import asyncio
+import os
+
+import pytest
+
+
+def _rows(count):
+    from models.ifc_schemas import IfcBeamRow
+    return [IfcBeamRow(name=f"B{i}", length=3.0, width=0.2, height=0.4, x=float(i)) for i in range(count)]
+
+
+def test_manager_reports_progress():
+    from services.build_progress import BuildProgress, BuildStage
+    from services.ifc_model_manager_factory import create_ifc_beams_file
+
+    progress = BuildProgress(elements_total=3)
+    path = create_ifc_beams_file(_rows(3), "IFC4", progress)
+
+    assert progress.stage is BuildStage.SERIALIZATION
+    assert progress.elements_created == 3
+    assert progress.bytes_written == os.path.getsize(path)
+
+
+def test_stream_ends_with_complete_event():
+    from services.build_progress import BuildProgress, stream_build_progress
+    from services.ifc_model_manager_factory import create_ifc_beams_file
+
+    async def collect():
+        build = lambda progress: create_ifc_beams_file(_rows(5), "IFC2X3", progress)
+        return [event async for event in stream_build_progress(build, BuildProgress(5), interval=0.01)]
+
+    events = asyncio.run(collect())
+    assert events[-1]["event"] == "complete"
+    assert os.path.isfile(events[-1]["path"])
+    assert events[-2]["elements_created"] == 5
+    assert events[-2]["bytes_written"] > 0
+
+
+def test_stream_reports_build_errors():
+    from services.build_progress import BuildProgress, stream_build_progress
+
+    def build(progress):
+        raise ValueError("Unsupported schema version: IFC9")
+
+    async def collect():
+        return [event async for event in stream_build_progress(build, BuildProgress(), interval=0.01)]
+
+    assert asyncio.run(collect())[-1] == {"event": "error", "detail": "Unsupported schema version: IFC9"}
+
+
+def test_stream_outlives_its_consumer_until_the_build_ends():
+    import threading
+    import time
+
+    from services.build_progress import BuildProgress, stream_build_progress
+
+    finished = threading.Event()
+
+    def build(progress):
+        time.sleep(0.2)
+        finished.set()
+        return "model.ifc"
+
+    async def run():
+        events = []
+
+        async def consume():
+            async for event in stream_build_progress(build, BuildProgress(), interval=0.01):
+                events.append(event)
+
+        # The client goes away while the model is still being built
+        task = asyncio.ensure_future(consume())
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        return events, finished.is_set()
+
+    events, finished_before_release = asyncio.run(run())
+    assert events and events[-1]["event"] == "progress"
+    assert finished_before_release
@@ -0,0 +1,124 @@
+import asyncio
+
+import pytest
+
+
+async def _chunks(body: bytes, size: int):
+    for start in range(0, len(body), size):
+        yield body[start:start + size]
+
+
+def _ingest(body: bytes, media_type: str, size: int = 5, max_errors: int = 100):
+    from services.element_ingest import ingest_beams
+    from services.ifc_model_manager_factory import IfcModelManagerFactory
+
+    manager = IfcModelManagerFactory.create_manager("IFC4")
+    manager.create_file().initialize_model()
+    report = asyncio.run(ingest_beams(manager, _chunks(body, size), media_type, max_errors=max_errors))
+    return manager, report
+
+
+def test_iter_lines_handles_split_characters_and_lines():
+    from services.element_ingest import iter_lines
+
+    async def collect():
+        return [line async for line in iter_lines(_chunks("a,é\r\nb\nc".encode(), 1))]
+
+    assert asyncio.run(collect()) == ["a,é", "b", "c"]
+
+
+def test_ingest_csv_skips_byte_order_mark():
+    body = "\ufeffname,length,width,height\nB1,5,0.2,0.4\n".encode()
+    manager, report = _ingest(body, "text/csv", size=1)
+
+    assert (report.created, report.error_count) == (1, 0)
+
+
+def test_iter_lines_rejects_unbounded_lines():
+    from services.element_ingest import iter_lines
+
+    async def collect():
+        return [line async for line in iter_lines(_chunks(b"x" * 100, 10), max_line_length=50)]
+
+    with pytest.raises(ValueError):
+        asyncio.run(collect())
+
+
+def test_ingest_csv_collects_row_errors():
+    body = (b"name,length,width,height,x,y,z\n"
+            b"B1,5,0.2,0.4,1,0,0\n"
+            b"B2,-5,0.2,0.4,,,\n"
+            b"B3,5\n"
+            b"\n"
+            b"B4,3,0.1,0.1,,,\n")
+    manager, report = _ingest(body, "text/csv")
+
+    assert (report.rows, report.created, report.error_count) == (4, 2, 2)
+    assert [error.row for error in report.errors] == [3, 4]
+    manager.save()
+    assert [beam.Name for beam in manager.model.by_type("IfcBeam")] == ["B1", "B4"]
+    containment = manager.model.by_type("IfcRelContainedInSpatialStructure")
+    assert len(containment) == 1 and len(containment[0].RelatedElements) == 2
+
+
+def test_ingest_ndjson_caps_stored_errors():
+    body = b'{"name": "B1", "length": 5, "width": 0.2, "height": 0.4}\n' + b"[]\n" * 10
+    _, report = _ingest(body, "application/x-ndjson", max_errors=3)
+
+    assert report.created == 1
+    assert report.error_count == 10
+    assert len(report.errors) == 3
+
+
+def test_ingest_reports_builder_errors_without_blocking(monkeypatch):
+    from services import element_ingest
+    from services.ifc_model_manager_factory import IfcModelManagerFactory
+
+    monkeypatch.setattr(element_ingest, "ROW_BATCH_SIZE", 1)
+    monkeypatch.setattr(element_ingest, "MAX_PENDING_BATCHES", 1)
+    body = b"name,length,width,height\n" + b"B,5,0.2,0.4\n" * 20
+    # Not initialized, so the builder thread fails on the first row
+    manager = IfcModelManagerFactory.create_manager("IFC4")
+
+    with pytest.raises(ValueError, match="initialized"):
+        asyncio.run(element_ingest.ingest_beams(manager, _chunks(body, 7), "text/csv"))
+
+
+
+def test_cancelled_ingest_returns_only_once_the_builder_has(monkeypatch):
+    import threading
+    import time
+
+    from services import element_ingest
+
+    monkeypatch.setattr(element_ingest, "ROW_BATCH_SIZE", 1)
+    building = threading.Event()
+    added = []
+
+    class SlowManager:
+        def add_building_element(self, creator):
+            building.set()
+            time.sleep(0.05)
+            added.append(creator)
+
+    async def endless():
+        yield b"name,length,width,height\n"
+        for _ in range(3):
+            yield b"B,5,0.2,0.4\n"
+        await asyncio.Event().wait()
+
+    async def run():
+        ingest = asyncio.create_task(element_ingest.ingest_beams(SlowManager(), endless(), "text/csv"))
+        await asyncio.to_thread(building.wait)
+        # Cancelled again while it waits for the builder, as anyio's cancel scopes do
+        ingest.cancel()
+        await asyncio.sleep(0.01)
+        ingest.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await ingest
+        return len(added)
+
+    # Every queued row was built before the cancellation went through
+    assert asyncio.run(run()) == 3
+    time.sleep(0.1)
+    assert len(added) == 3
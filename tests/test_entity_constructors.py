@@ -0,0 +1,40 @@
+import ifcopenshell
+import pytest
+
+from services.strategies.ifc2x3_strategy import IFC2X3Strategy
+from services.strategies.ifc4_strategy import IFC4Strategy
+from services.strategies.ifc4x3_strategy import IFC4X3Strategy
+
+
+@pytest.mark.parametrize("strategy", [IFC2X3Strategy(), IFC4Strategy(), IFC4X3Strategy()])
+def test_constructor_matches_create_entity(strategy):
+    model = ifcopenshell.file(schema=strategy.get_schema())
+    entities = strategy.get_entity_constructors()
+
+    origin = entities.IfcCartesianPoint(model, Coordinates=(1.0, 2.0, 3.0))
+    placement = entities.IfcAxis2Placement3D(model, Location=origin)
+    expected = model.create_entity("IfcAxis2Placement3D", Location=origin)
+
+    assert origin.Coordinates == (1.0, 2.0, 3.0)
+    assert placement.is_a() == "IfcAxis2Placement3D"
+    assert list(placement) == list(expected)
+    assert len(model.by_type("IfcAxis2Placement3D")) == 2
+
+
+def test_constructors_are_compiled_once_per_schema():
+    assert IFC4Strategy().get_entity_constructors() is IFC4Strategy().get_entity_constructors()
+    assert IFC4Strategy().get_entity_constructors() is not IFC2X3Strategy().get_entity_constructors()
+
+
+def test_schema_defaults_are_applied():
+    model = ifcopenshell.file(schema="IFC2X3")
+    entities = IFC2X3Strategy().get_entity_constructors()
+    site = entities.IfcSite(model, GlobalId=ifcopenshell.guid.new(), Name="Site")
+    assert site.CompositionType == "ELEMENT"
+
+
+def test_unknown_attribute_raises():
+    model = ifcopenshell.file(schema="IFC2X3")
+    entities = IFC2X3Strategy().get_entity_constructors()
+    with pytest.raises(ValueError):
+        entities.IfcOrganization(model, Identification="x", Name="Brunner246")
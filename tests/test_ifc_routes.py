@@ -0,0 +1,171 @@
+import asyncio
+import json
+
+import pytest
+
+
+@pytest.fixture
+def routes(monkeypatch):
+    """The routes module with a two-worker scheduler, one queued job per lane, and a 100-element
+    memory budget"""
+    from api.v1 import ifc_routes
+    from services.admission import AdmissionController, CostModel, LinearCost, SchemaCost
+    from services.scheduler import GenerationScheduler
+
+    cost = SchemaCost(entities=LinearCost(10, 20), memory_bytes=LinearCost(0, 1000), seconds=LinearCost(0, 0.001))
+    monkeypatch.setattr(ifc_routes, "admission_controller",
+                        AdmissionController(CostModel({"IFC4": cost}), memory_budget_bytes=100_000))
+    monkeypatch.setattr(ifc_routes, "scheduler",
+                        GenerationScheduler(workers=2, reserved_interactive=1, interactive_max_elements=40,
+                                            max_queue=1, queue_timeout=0.2))
+    return ifc_routes
+
+
+def test_queued_bulk_build_holds_no_memory(routes):
+    from services.admission import RequestTooLarge
+
+    async def run():
+        release = asyncio.Event()
+
+        async def build(elements):
+            async with routes._build_slot(elements, "IFC4"):
+                await release.wait()
+
+        first = asyncio.create_task(build(45))
+        queued = asyncio.create_task(build(45))
+        await asyncio.sleep(0.01)
+        # The second bulk build waits for the only bulk slot without reserving memory,
+        # so a small request still fits in the budget
+        reserved = routes.admission_controller.reserved_bytes
+        small = asyncio.create_task(build(40))
+        await asyncio.sleep(0.01)
+        admitted = routes.admission_controller.reserved_bytes
+        release.set()
+        await asyncio.gather(first, queued, small)
+        return reserved, admitted
+
+    assert asyncio.run(run()) == (45_000, 85_000)
+
+    async def oversized():
+        async with routes._build_slot(101, "IFC4"):
+            pass
+
+    with pytest.raises(RequestTooLarge):
+        asyncio.run(oversized())
+
+
+async def _post(app, path: str, body, query: str = "", content_type: str = "application/json", messages=None):
+    """(status, headers, body) of a POST of ``body`` (JSON-encoded unless bytes) sent straight to the ASGI
+    ``app``; the ASGI messages sent are appended to ``messages``"""
+    payload = body if isinstance(body, bytes) else json.dumps(body).encode()
+    scope = {"type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "POST", "scheme": "http",
+             "path": path, "raw_path": path.encode(), "query_string": query.encode(), "root_path": "",
+             "headers": [(b"content-type", content_type.encode()), (b"content-length", str(len(payload)).encode())],
+             "client": ("127.0.0.1", 1), "server": ("testserver", 80)}
+    requests = [{"type": "http.request", "body": payload, "more_body": False}]
+    messages = [] if messages is None else messages
+
+    async def receive():
+        if requests:
+            return requests.pop()
+        await asyncio.Event().wait()
+
+    async def send(message):
+        messages.append(message)
+
+    await app(scope, receive, send)
+    start = next(message for message in messages if message["type"] == "http.response.start")
+    return (start["status"], dict(start["headers"]),
+            b"".join(message.get("body", b"") for message in messages if message["type"] == "http.response.body"))
+
+
+def test_progress_route_streams_until_the_build_completes(routes):
+    from main import app
+
+    beams = [{"name": f"B{i}", "length": 3.0, "width": 0.2, "height": 0.4, "x": float(i)} for i in range(3)]
+    status, headers, body = asyncio.run(_post(app, "/api/v1/create_ifc_beams/progress", {"beams": beams}))
+
+    assert status == 200
+    assert headers[b"content-type"] == b"application/x-ndjson"
+    events = [json.loads(line) for line in body.decode().splitlines()]
+    assert events[0]["event"] == "progress"
+    assert events[-1]["event"] == "complete" and "/artifacts/" in events[-1]["artifact"]
+    assert routes.admission_controller.reserved_bytes == 0
+
+
+def test_builds_queued_past_the_scheduler_limit_are_rejected(routes):
+    from main import app
+
+    beams = [{"name": f"B{i}", "length": 3.0, "width": 0.2, "height": 0.4, "x": float(i)} for i in range(45)]
+
+    async def run():
+        release = asyncio.Event()
+
+        async def hold():
+            async with routes.scheduler.slot(45):
+                await release.wait()
+
+        running = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        # Waits for the only bulk slot until it times out
+        timed_out = asyncio.create_task(_post(app, "/api/v1/create_ifc_beams", {"beams": beams}))
+        await asyncio.sleep(0.01)
+        queue_full = await _post(app, "/api/v1/create_ifc_beams", {"beams": beams})
+        responses = [queue_full, await timed_out]
+        release.set()
+        await running
+        return responses
+
+    (full_status, full_headers, full_body), (timeout_status, _, timeout_body) = asyncio.run(run())
+    assert (full_status, timeout_status) == (429, 429)
+    assert b"retry-after" in full_headers
+    assert b"waiting" in full_body and b"within 0.2s" in timeout_body
+    assert routes.scheduler.stats()["lanes"]["bulk"]["queued"] == 0
+    assert routes.admission_controller.reserved_bytes == 0
+
+
+def test_upload_reservation_is_resized_to_the_parsed_rows(routes):
+    from main import app
+
+    rows = "".join(f"B{i},3.5,0.2,0.4,{i}.25,0,0\n" for i in range(10))
+    body = ("name,length,width,height,x,y,z\n" + rows).encode()
+    status, _, response = asyncio.run(_post(app, "/api/v1/create_ifc_beams/upload", body, content_type="text/csv"))
+
+    assert status == 200
+    assert json.loads(response)["created"] == 10
+    [record] = routes.admission_controller.records
+    assert (record.element_count, record.estimate.memory_bytes) == (10, 10_000)
+    assert routes.admission_controller.reserved_bytes == 0
+
+
+def test_streamed_requests_are_logged_once_the_body_is_sent(routes):
+    import logging
+
+    from main import app
+
+    events = []
+    messages = []
+
+    class Recorder(logging.Handler):
+        def emit(self, record):
+            if record.msg.name == "request.finished":
+                events.append((record.msg, len(messages)))
+
+    handler = Recorder()
+    logger = logging.getLogger("main")
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    try:
+        beams = [{"name": "B", "length": 3.0, "width": 0.2, "height": 0.4}]
+        status, headers, _ = asyncio.run(_post(app, "/api/v1/create_ifc_beams/progress", {"beams": beams},
+                                               messages=messages))
+    finally:
+        logger.removeHandler(handler)
+        logger.setLevel(logging.NOTSET)
+
+    assert status == 200 and len(headers[b"x-request-id"]) == 32
+    [(finished, sent)] = events
+    assert finished.fields["status"] == 200
+    assert finished.context["request_id"] == headers[b"x-request-id"].decode()
+    # Only logged once the last chunk of the streamed body went out
+    assert sent == len(messages) > 2
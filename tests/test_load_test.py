@@ -0,0 +1,35 @@
+import asyncio
+
+
+def test_percentile_interpolates():
+    from benchmarks.load_test import percentile
+
+    assert percentile([], 0.5) is None
+    assert percentile([3.0], 0.99) == 3.0
+    assert percentile([1.0, 2.0, 3.0, 4.0], 0.5) == 2.5
+
+
+def test_plan_is_reproducible():
+    from benchmarks.load_test import parse_mix, plan_requests
+
+    weights = parse_mix("single=3,bulk=1")
+    first = [(scenario.name, schema, path) for scenario, schema, path, _ in
+             plan_requests(weights, ["IFC4", "IFC2X3"], 20, seed=1)]
+    second = [(scenario.name, schema, path) for scenario, schema, path, _ in
+              plan_requests(weights, ["IFC4", "IFC2X3"], 20, seed=1)]
+    assert first == second
+    assert all("schema=" in path for name, _, path in first if name == "bulk")
+
+
+def test_in_process_run_summary():
+    from benchmarks.load_test import AsgiTransport, parse_mix, plan_requests, read_rss_kb, run_load_test, summarize
+    from main import app
+
+    plan = plan_requests(parse_mix("single"), ["IFC4"], 4, seed=0)
+    result = asyncio.run(run_load_test(lambda: AsgiTransport(app), plan, 2, {}, read_rss_kb, rss_interval=0.01))
+    summary = summarize(result)
+
+    assert summary["overall"]["requests"] == 4
+    assert summary["overall"]["error_rate"] == 0.0
+    assert summary["overall"]["p50_ms"] <= summary["overall"]["p99_ms"]
+    assert set(summary["by_scenario"]) == {"single/IFC4"}
@@ -0,0 +1,134 @@
+import ifcopenshell
+
+
+def _rows(count):
+    from models.ifc_schemas import IfcBeamRow
+    return [IfcBeamRow(name=f"B{i}", length=3.0, width=0.2, height=0.4, x=float(i)) for i in range(count)]
+
+
+def test_identical_subgraphs_collapse_and_orphans_are_purged():
+    from services.model_compactor import compact_model
+
+    model = ifcopenshell.file(schema="IFC4")
+    project = model.create_entity("IfcProject", GlobalId=ifcopenshell.guid.new(), Name="P")
+    points = [model.create_entity("IfcCartesianPoint", Coordinates=(0.0, 0.0, 0.0)) for _ in range(2)]
+    placements = [model.create_entity("IfcAxis2Placement3D", Location=point) for point in points]
+    context = model.create_entity("IfcGeometricRepresentationContext", CoordinateSpaceDimension=3,
+                                  WorldCoordinateSystem=placements[0])
+    other_context = model.create_entity("IfcGeometricRepresentationContext", CoordinateSpaceDimension=3,
+                                        WorldCoordinateSystem=placements[1])
+    project.RepresentationContexts = [context, other_context]
+    model.create_entity("IfcDirection", DirectionRatios=(1.0, 0.0))
+
+    compacted, report = compact_model(model)
+
+    assert (report.entities_before, report.entities_after) == (8, 4)
+    assert (report.duplicates_merged, report.unreachable_removed) == (3, 1)
+    assert report.bytes_saved > 0
+    assert len(compacted.by_type("IfcCartesianPoint")) == 1
+    assert len(compacted.by_type("IfcProject")[0].RepresentationContexts) == 1
+
+
+def test_products_keep_their_own_placement_and_styled_items_are_not_merged():
+    from services.model_compactor import compact_model
+
+    model = ifcopenshell.file(schema="IFC2X3")
+    solids = []
+    for colour in (0.0, 1.0):
+        point = model.create_entity("IfcCartesianPoint", Coordinates=(0.0, 0.0))
+        profile = model.create_entity("IfcRectangleProfileDef", ProfileType="AREA", XDim=1.0, YDim=1.0,
+                                      Position=model.create_entity("IfcAxis2Placement2D", Location=point))
+        solid = model.create_entity("IfcExtrudedAreaSolid", SweptArea=profile, Depth=1.0)
+        style = model.create_entity("IfcColourRgb", Red=colour, Green=colour, Blue=colour)
+        model.create_entity("IfcStyledItem", Item=solid, Styles=[model.create_entity(
+            "IfcPresentationStyleAssignment", Styles=[model.create_entity(
+                "IfcSurfaceStyle", Side="BOTH", Styles=[model.create_entity("IfcSurfaceStyleShading",
+                                                                           SurfaceColour=style)])])])
+        solids.append(solid)
+    for _ in range(2):
+        model.create_entity("IfcBeam", GlobalId=ifcopenshell.guid.new(),
+                            ObjectPlacement=model.create_entity("IfcLocalPlacement"))
+
+    compacted, report = compact_model(model)
+
+    assert len(compacted.by_type("IfcExtrudedAreaSolid")) == 2
+    assert len(compacted.by_type("IfcRectangleProfileDef")) == 1
+    assert len(compacted.by_type("IfcLocalPlacement")) == 2
+    assert report.unreachable_removed == 0
+
+
+def test_compacted_save_and_file_round_trip(tmp_path):
+    from services.build_progress import BuildProgress
+    from services.ifc_model_manager_factory import create_ifc_beams_file
+    from services.model_compactor import compact_file
+
+    progress = BuildProgress()
+    path = create_ifc_beams_file(_rows(20), "IFC4", progress, compact=True)
+    model = ifcopenshell.open(path)
+    assert progress.entities == len(model.wrapped_data.entity_names())
+    assert len(model.by_type("IfcBeam")) == 20
+    assert len(model.by_type("IfcDirection")) == 4
+
+    plain = create_ifc_beams_file(_rows(20), "IFC4X3")
+    report = compact_file(plain, str(tmp_path / "compacted.ifc"))
+    assert report.entities_saved > 0
+    assert report.bytes_saved > 0
+    assert len(ifcopenshell.open(str(tmp_path / "compacted.ifc")).by_type("IfcRelContainedInSpatialStructure")) == 1
+
+
+def test_resources_attached_by_inverse_attributes_are_kept():
+    from services.model_compactor import compact_model
+
+    model = ifcopenshell.file(schema="IFC4")
+    origin = model.create_entity("IfcAxis2Placement3D",
+                                 Location=model.create_entity("IfcCartesianPoint", Coordinates=(0.0, 0.0, 0.0)))
+    context = model.create_entity("IfcGeometricRepresentationContext", CoordinateSpaceDimension=3,
+                                  WorldCoordinateSystem=origin)
+    model.create_entity("IfcProject", GlobalId=ifcopenshell.guid.new(), Name="P", RepresentationContexts=[context])
+    crs = model.create_entity("IfcProjectedCRS", Name="EPSG:25832")
+    model.create_entity("IfcMapConversion", SourceCRS=context, TargetCRS=crs, Eastings=1.0, Northings=2.0,
+                        OrthogonalHeight=3.0)
+
+    steel = model.create_entity("IfcMaterial", Name="Steel")
+    model.create_entity("IfcRelAssociatesMaterial", GlobalId=ifcopenshell.guid.new(),
+                        RelatedObjects=[model.create_entity("IfcBeam", GlobalId=ifcopenshell.guid.new())],
+                        RelatingMaterial=steel)
+    model.create_entity("IfcMaterialProperties", Name="Pset_MaterialSteel", Material=steel, Properties=[
+        model.create_entity("IfcPropertySingleValue", Name="YieldStress",
+                            NominalValue=model.create_entity("IfcPressureMeasure", 355e6))])
+    # Only reachable through the grade, which hangs off the steel by an inverse attribute
+    grade = model.create_entity("IfcMaterial", Name="S355")
+    model.create_entity("IfcMaterialRelationship", RelatingMaterial=steel, RelatedMaterials=[grade])
+    model.create_entity("IfcMaterialProperties", Name="Pset_MaterialSteel", Material=grade, Properties=[
+        model.create_entity("IfcPropertySingleValue", Name="Grade",
+                            NominalValue=model.create_entity("IfcLabel", "S355"))])
+    model.create_entity("IfcDirection", DirectionRatios=(1.0, 0.0))
+    # Refers into the kept graph, but is not a resource that belongs to what it refers to
+    model.create_entity("IfcLocalPlacement", RelativePlacement=origin)
+
+    compacted, report = compact_model(model)
+
+    assert report.unreachable_removed == 2
+    assert not compacted.by_type("IfcDirection") and not compacted.by_type("IfcLocalPlacement")
+    conversion = compacted.by_type("IfcMapConversion")[0]
+    assert conversion.TargetCRS.Name == "EPSG:25832"
+    assert conversion.SourceCRS == compacted.by_type("IfcGeometricRepresentationContext")[0]
+    assert len(compacted.by_type("IfcMaterialRelationship")) == 1
+    assert {properties.Properties[0].Name for properties in compacted.by_type("IfcMaterialProperties")} == \
+        {"YieldStress", "Grade"}
+
+
+def test_orphan_placements_of_a_beam_model_are_purged():
+    from services.ifc_model_manager_factory import beam_dto_from_row, create_beams_model
+    from services.model_compactor import compact_model
+
+    model = ifcopenshell.open(create_beams_model([beam_dto_from_row(row) for row in _rows(10)], "IFC4"))
+    orphans = [placement for placement in model.by_type("IfcLocalPlacement")
+               if not model.get_total_inverses(placement)]
+    assert orphans
+
+    compacted, report = compact_model(model)
+
+    assert report.unreachable_removed >= len(orphans)
+    assert len(compacted.by_type("IfcLocalPlacement")) == len(model.by_type("IfcLocalPlacement")) - len(orphans)
+    assert all(compacted.get_total_inverses(placement) for placement in compacted.by_type("IfcLocalPlacement"))
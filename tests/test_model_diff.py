@@ -0,0 +1,74 @@
+import ifcopenshell
+import pytest
+
+
+def _write(path, beams, schema="IFC4"):
+    from models.ifc_schemas import IfcBeamRow
+    from services.ifc_model_manager_factory import IfcModelManagerFactory, beam_dto_from_row
+    from services.strategies.beam_creator import IfcBeamCreator
+
+    manager = IfcModelManagerFactory.create_manager(schema)
+    manager.create_file().initialize_model()
+    for name, x, height in beams:
+        row = IfcBeamRow(name=name, length=3.0, width=0.2, height=height, x=x)
+        manager.add_building_element(IfcBeamCreator(beam_dto_from_row(row)))
+    manager.save(str(path))
+    return ifcopenshell.open(str(path))
+
+
+def _with_guids(path, source, beams, schema="IFC4"):
+    """Regenerate ``beams`` reusing the GlobalIds of ``source``'s elements, matched by name"""
+    model = _write(path, beams, schema)
+    guids = {product.Name: product.GlobalId for product in source.by_type("IfcProduct")}
+    for product in model.by_type("IfcProduct"):
+        if product.Name in guids:
+            product.GlobalId = guids[product.Name]
+    model.write(str(path))
+
+
+def test_regenerated_model_with_the_same_guids_is_unchanged(tmp_path):
+    from services.model_diff import diff_files
+
+    old = _write(tmp_path / "old.ifc", [("A", 0.0, 0.4), ("B", 1.0, 0.4)], "IFC2X3")
+    # New timestamps and entity numbering must not count as changes
+    _with_guids(tmp_path / "new.ifc", old, [("A", 0.0, 0.4), ("B", 1.0, 0.4)], "IFC2X3")
+
+    diff = diff_files(str(tmp_path / "old.ifc"), str(tmp_path / "new.ifc"))
+
+    assert (diff.added, diff.removed, diff.modified) == ([], [], [])
+    assert diff.unchanged == len(old.by_type("IfcProduct"))
+
+    # Built again from scratch, every element gets a new GlobalId and nothing matches
+    _write(tmp_path / "rebuilt.ifc", [("A", 0.0, 0.4), ("B", 1.0, 0.4)], "IFC2X3")
+    rebuilt = diff_files(str(tmp_path / "old.ifc"), str(tmp_path / "rebuilt.ifc"))
+    assert rebuilt.unchanged == 0
+    assert len(rebuilt.removed) == len(rebuilt.added) == len(old.by_type("IfcProduct"))
+
+
+def test_reports_added_removed_and_modified_elements(tmp_path):
+    from services.model_diff import diff_files
+
+    old = _write(tmp_path / "old.ifc", [("A", 0.0, 0.4), ("B", 1.0, 0.4), ("C", 2.0, 0.4)])
+    _with_guids(tmp_path / "new.ifc", old, [("A", 0.0, 0.5), ("B", 1.5, 0.4), ("D", 3.0, 0.4)])
+
+    diff = diff_files(str(tmp_path / "old.ifc"), str(tmp_path / "new.ifc"))
+
+    assert [(element.type, element.name) for element in diff.removed] == [("IfcBeam", "C")]
+    assert [(element.type, element.name) for element in diff.added] == [("IfcBeam", "D")]
+    modified = {element.name: element for element in diff.modified}
+    assert set(modified) == {"A", "B"}
+    assert modified["A"].aspects == ["geometry"]
+    assert [change for path, change in modified["A"].changes.items() if path.endswith("SweptArea.YDim")] == [[0.4, 0.5]]
+    assert modified["B"].aspects == ["placement"]
+    assert list(modified["B"].changes.values()) == [[[1.0, 0.0, 0.0], [1.5, 0.0, 0.0]]]
+    assert diff.unchanged == len(old.by_type("IfcProduct")) - 3
+
+
+def test_rejects_files_that_are_not_ifc(tmp_path):
+    from services.model_diff import diff_files
+
+    (tmp_path / "old.ifc").write_text("not a step file")
+    _write(tmp_path / "new.ifc", [("A", 0.0, 0.4)])
+
+    with pytest.raises(ValueError):
+        diff_files(str(tmp_path / "old.ifc"), str(tmp_path / "new.ifc"))
@@ -0,0 +1,111 @@
+import json
+import os
+
+import ifcopenshell
+import ifcopenshell.guid
+
+
+def _manager(count, schema="IFC4"):
+    from models.ifc_schemas import IfcBeamRow
+    from services.ifc_model_manager_factory import IfcModelManagerFactory, beam_dto_from_row
+    from services.strategies.beam_creator import IfcBeamCreator
+
+    manager = IfcModelManagerFactory.create_manager(schema)
+    manager.create_file().initialize_model()
+    for i in range(count):
+        row = IfcBeamRow(name=f"B{i}", length=1.0, width=0.2, height=0.4, x=float(i))
+        manager.add_building_element(IfcBeamCreator(beam_dto_from_row(row)))
+    return manager
+
+
+def _open_partitions(manifest_path):
+    manifest = json.loads(open(manifest_path).read())
+    directory = os.path.dirname(manifest_path)
+    return manifest, [ifcopenshell.open(os.path.join(directory, partition["file"]))
+                      for partition in manifest["partitions"]]
+
+
+def test_tiles_share_the_spatial_skeleton(tmp_path):
+    from services.model_partitioner import TilePartitioning
+
+    manager = _manager(6, "IFC2X3")
+    manifest_path = manager.save(str(tmp_path / "model.ifc"), partitioning=TilePartitioning(2.0))
+    manifest, models = _open_partitions(manifest_path)
+
+    assert [partition["key"] for partition in manifest["partitions"]] == ["x0_y0", "x1_y0", "x2_y0"]
+    assert [partition["elements"] for partition in manifest["partitions"]] == [2, 2, 2]
+    assert all(partition["bytes"] == os.path.getsize(tmp_path / partition["file"])
+               for partition in manifest["partitions"])
+    for type_name in ("IfcProject", "IfcSite", "IfcBuilding", "IfcBuildingStorey"):
+        assert len({model.by_type(type_name)[0].GlobalId for model in models}) == 1
+    # Each tile carries its own share of the storey's containment, under a stable GlobalId
+    containments = [model.by_type("IfcRelContainedInSpatialStructure") for model in models]
+    assert [len(rels[0].RelatedElements) for rels in containments] == [2, 2, 2]
+    assert len({rels[0].GlobalId for rels in containments}) == 3
+    assert [beam.Name for beam in models[1].by_type("IfcBeam")] == ["B2", "B3"]
+
+
+def test_storeys_get_a_file_each(tmp_path):
+    from services.model_partitioner import StoreyPartitioning
+
+    manager = _manager(2)
+    upper = manager.entities.IfcBuildingStorey(manager.model, GlobalId=ifcopenshell.guid.new(), Name="Upper")
+    manager._create_aggregation(manager.building, [upper])
+    beam = manager.entities.IfcBeam(manager.model, GlobalId=ifcopenshell.guid.new(), Name="Upper beam")
+    manager.entities.IfcRelContainedInSpatialStructure(manager.model, GlobalId=ifcopenshell.guid.new(),
+                                                       RelatingStructure=upper, RelatedElements=[beam])
+
+    manifest, models = _open_partitions(manager.save(str(tmp_path / "model.ifc"), partitioning=StoreyPartitioning()))
+
+    assert [partition["storeys"][0]["Name"] for partition in manifest["partitions"]] == ["Storey", "Upper"]
+    assert [len(model.by_type("IfcBeam")) for model in models] == [2, 1]
+    assert [[storey.Name for storey in model.by_type("IfcBuildingStorey")] for model in models] == [["Storey"], ["Upper"]]
+    # Relationships a partition carries completely keep their GlobalId
+    lower_containment = next(rel for rel in manager.model.by_type("IfcRelContainedInSpatialStructure")
+                             if rel.RelatingStructure == manager.storey)
+    assert models[0].by_type("IfcRelContainedInSpatialStructure")[0].GlobalId == lower_containment.GlobalId
+
+
+def test_worker_processes_write_the_same_partitions(tmp_path, monkeypatch):
+    from services import model_partitioner
+
+    manager = _manager(4)
+    manager.save(str(tmp_path / "model.ifc"))
+    in_process = json.loads(open(model_partitioner.write_partitions(
+        manager.model, str(tmp_path / "a.ifc"), model_partitioner.TilePartitioning(2.0))).read())
+    monkeypatch.setattr(model_partitioner, "MIN_ELEMENTS_FOR_WORKERS", 0)
+    try:
+        workers = json.loads(open(model_partitioner.write_partitions(
+            manager.model, str(tmp_path / "b.ifc"), model_partitioner.TilePartitioning(2.0), workers=2)).read())
+        pool = model_partitioner._executor
+        # The pool is kept for the next save
+        model_partitioner.write_partitions(manager.model, str(tmp_path / "c.ifc"),
+                                           model_partitioner.TilePartitioning(2.0), workers=2)
+        assert pool is not None and model_partitioner._executor is pool
+    finally:
+        model_partitioner.shutdown_workers()
+
+    assert ([partition["entities"] for partition in workers["partitions"]]
+            == [partition["entities"] for partition in in_process["partitions"]])
+    assert not (tmp_path / "b.source.ifc").exists()
+
+
+def test_saves_write_in_process_while_the_pool_is_taken(tmp_path, monkeypatch):
+    from services import model_partitioner
+
+    manager = _manager(4)
+    monkeypatch.setattr(model_partitioner, "MIN_ELEMENTS_FOR_WORKERS", 0)
+    with model_partitioner._executor_lock:
+        manifest = json.loads(open(model_partitioner.write_partitions(
+            manager.model, str(tmp_path / "a.ifc"), model_partitioner.TilePartitioning(2.0), workers=2)).read())
+    assert len(manifest["partitions"]) > 1
+    assert model_partitioner._executor is None
+
+
+def test_shares_balance_elements():
+    from services.model_partitioner import PartitionSpec, _shares
+
+    specs = [PartitionSpec(str(size), element_ids=list(range(size))) for size in (5, 1, 4, 2, 3)]
+    shares = _shares(specs, 2)
+    assert sorted(sum(len(specs[index].element_ids) for index in share) for share in shares) == [7, 8]
+    assert _shares(specs[:1], 3) == [[0]]
@@ -0,0 +1,139 @@
+import asyncio
+
+import pytest
+
+
+def _scheduler(**kwargs):
+    from services.scheduler import GenerationScheduler
+    return GenerationScheduler(**{"workers": 2, "reserved_interactive": 1, "interactive_max_elements": 10,
+                                  "max_bulk_wait": 60.0, **kwargs})
+
+
+def test_reserved_slot_is_kept_for_interactive_requests():
+    scheduler = _scheduler()
+    order = []
+
+    async def build(name, elements, hold):
+        async with scheduler.slot(elements):
+            order.append(name)
+            await hold.wait()
+
+    async def run():
+        bulk_done, single_done = asyncio.Event(), asyncio.Event()
+        bulk = [asyncio.create_task(build(f"bulk{i}", 1000, bulk_done)) for i in range(2)]
+        await asyncio.sleep(0)
+        single = asyncio.create_task(build("single", 1, single_done))
+        await asyncio.sleep(0.01)
+        stats = scheduler.stats()["lanes"]
+        single_done.set()
+        bulk_done.set()
+        await asyncio.gather(*bulk, single)
+        return stats
+
+    stats = asyncio.run(run())
+    assert order == ["bulk0", "single", "bulk1"]
+    assert stats["bulk"]["queued"] == 1 and stats["bulk"]["running"] == 1
+    assert stats["interactive"]["running"] == 1
+
+
+def test_smallest_job_runs_first():
+    scheduler = _scheduler(workers=2, reserved_interactive=0)
+    order = []
+
+    async def build(name, elements, hold=None):
+        async with scheduler.slot(elements):
+            order.append(name)
+            if hold:
+                await hold.wait()
+
+    async def run():
+        hold = asyncio.Event()
+        blockers = [asyncio.create_task(build(f"blocker{i}", 1, hold)) for i in range(2)]
+        await asyncio.sleep(0)
+        waiting = [asyncio.create_task(build(name, size)) for name, size in (("big", 5000), ("small", 20), ("mid", 300))]
+        await asyncio.sleep(0)
+        hold.set()
+        await asyncio.gather(*blockers, *waiting)
+
+    asyncio.run(run())
+    assert order[2:] == ["small", "mid", "big"]
+
+
+def test_aged_bulk_job_overtakes_interactive_queue():
+    scheduler = _scheduler(workers=2, reserved_interactive=1, max_bulk_wait=0.0)
+    order = []
+
+    async def build(name, elements, hold=None):
+        async with scheduler.slot(elements):
+            order.append(name)
+            if hold:
+                await hold.wait()
+
+    async def run():
+        hold = asyncio.Event()
+        blockers = [asyncio.create_task(build(f"blocker{i}", 1, hold)) for i in range(2)]
+        await asyncio.sleep(0)
+        waiting = [asyncio.create_task(build("single", 1)), asyncio.create_task(build("bulk", 1000))]
+        await asyncio.sleep(0)
+        hold.set()
+        await asyncio.gather(*blockers, *waiting)
+
+    asyncio.run(run())
+    assert order[2:] == ["bulk", "single"]
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    scheduler = _scheduler(workers=2, reserved_interactive=1)
+
+    async def run():
+        hold = asyncio.Event()
+
+        async def build(elements):
+            async with scheduler.slot(elements):
+                await hold.wait()
+
+        running = asyncio.create_task(build(1000))
+        await asyncio.sleep(0)
+        waiting = asyncio.create_task(build(2000))
+        await asyncio.sleep(0)
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        hold.set()
+        await running
+        return scheduler.stats()["lanes"]["bulk"]
+
+    bulk = asyncio.run(run())
+    assert (bulk["queued"], bulk["running"], bulk["completed"]) == (0, 0, 1)
+
+
+def test_run_returns_the_result():
+    assert asyncio.run(_scheduler().run(3, sum, [1, 2, 3])) == 6
+
+
+def test_full_queue_and_long_waits_are_refused():
+    from services.scheduler import SlotUnavailable
+
+    scheduler = _scheduler(max_queue=1, queue_timeout=0.05)
+
+    async def run():
+        hold = asyncio.Event()
+
+        async def build(elements):
+            async with scheduler.slot(elements):
+                await hold.wait()
+
+        running = asyncio.create_task(build(1000))
+        await asyncio.sleep(0)
+        waiting = asyncio.create_task(build(2000))
+        await asyncio.sleep(0)
+        with pytest.raises(SlotUnavailable, match="waiting"):
+            await build(3000)
+        with pytest.raises(SlotUnavailable, match="within"):
+            await waiting
+        hold.set()
+        await running
+        return scheduler.stats()["lanes"]["bulk"]
+
+    bulk = asyncio.run(run())
+    assert (bulk["queued"], bulk["running"], bulk["completed"]) == (0, 0, 1)
@@ -0,0 +1,83 @@
+import asyncio
+import os
+import zipfile
+
+import ifcopenshell
+import pytest
+
+
+def _beams(count):
+    from models.ifc_schemas import IfcBeamRow
+    from services.ifc_model_manager_factory import beam_dto_from_row
+    return [beam_dto_from_row(IfcBeamRow(name=f"B{i}", length=3.0, width=0.2, height=0.4, x=float(i)))
+            for i in range(count)]
+
+
+def test_normalize_schemas():
+    from services.schema_fan_out import normalize_schemas
+
+    assert normalize_schemas(["ifc4", "IFC2X3", "IFC4"]) == ["IFC4", "IFC2X3"]
+    with pytest.raises(ValueError):
+        normalize_schemas(["IFC4", "IFC5"])
+
+
+def test_fan_out_builds_every_schema_into_one_archive(tmp_path, monkeypatch):
+    from services.schema_fan_out import SchemaFanOut, write_archive
+
+    # Worker processes are only used with more than one CPU
+    monkeypatch.setattr("os.cpu_count", lambda: 2)
+
+    async def build():
+        fan_out = SchemaFanOut(workers=2)
+        try:
+            return await fan_out.build(_beams(3), ["IFC2X3", "IFC4X3"])
+        finally:
+            fan_out.shutdown()
+
+    artifacts = asyncio.run(build())
+    assert [artifact.schema for artifact in artifacts] == ["IFC2X3", "IFC4X3"]
+    assert [ifcopenshell.open(artifact.path).schema_identifier for artifact in artifacts] == ["IFC2X3", "IFC4X3_ADD2"]
+    assert all(artifact.entities > 0 for artifact in artifacts)
+
+    archive = write_archive(artifacts, str(tmp_path / "beams.zip"))
+    assert zipfile.ZipFile(archive).namelist() == ["ifc2x3.ifc", "ifc4x3.ifc"]
+
+
+def test_single_worker_builds_in_process(monkeypatch):
+    from services import schema_fan_out
+
+    fan_out = schema_fan_out.SchemaFanOut(workers=1)
+    assert fan_out.in_process
+    artifacts = asyncio.run(fan_out.build(_beams(3), ["IFC4", "IFC2X3"]))
+    assert [ifcopenshell.open(artifact.path).schema_identifier for artifact in artifacts] == ["IFC4", "IFC2X3"]
+    assert fan_out._executor is None
+
+    built = []
+
+    def build_or_fail(beams, schema, compact):
+        if schema == "IFC2X3":
+            raise RuntimeError("build failed")
+        built.append(schema_fan_out.create_beams_model(beams, schema))
+        return schema_fan_out.SchemaArtifact(schema, built[-1], 0)
+
+    monkeypatch.setattr(schema_fan_out, "_build", build_or_fail)
+    with pytest.raises(RuntimeError):
+        asyncio.run(fan_out.build(_beams(3), ["IFC4", "IFC2X3"]))
+    assert len(built) == 1 and not os.path.exists(built[0])
+
+def test_fan_out_is_admitted_as_the_sum_of_its_schemas():
+    from services.admission import AdmissionController, CostModel, LinearCost, SchemaCost
+
+    cost = SchemaCost(entities=LinearCost(10, 20), memory_bytes=LinearCost(0, 1000), seconds=LinearCost(0, 0.001))
+    controller = AdmissionController(CostModel({"IFC2X3": cost, "IFC4": cost}), memory_budget_bytes=100_000)
+    estimate = controller.estimate(40, "IFC2X3", "IFC4")
+    assert (estimate.entities, estimate.memory_bytes, estimate.seconds) == (1620, 80_000, pytest.approx(0.04))
+
+    async def admit():
+        async with controller.admit(40, "IFC2X3", "IFC4") as ticket:
+            assert controller.reserved_bytes == 80_000
+            assert ticket.schema == "IFC2X3+IFC4"
+
+    asyncio.run(admit())
+    assert controller.reserved_bytes == 0
+    assert not controller.records
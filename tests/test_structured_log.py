@@ -0,0 +1,108 @@
+import asyncio
+import io
+import json
+import logging
+
+import pytest
+
+
+class _Exploding:
+    def __repr__(self):
+        raise AssertionError("formatted although the level is disabled")
+
+
+@pytest.fixture
+def captured():
+    from core.structured_log import JsonFormatter
+
+    stream = io.StringIO()
+    handler = logging.StreamHandler(stream)
+    handler.setFormatter(JsonFormatter())
+    logger = logging.getLogger("tests.structured_log")
+    logger.addHandler(handler)
+    logger.setLevel(logging.INFO)
+    yield lambda: [json.loads(line) for line in stream.getvalue().splitlines()]
+    logger.removeHandler(handler)
+    logger.setLevel(logging.NOTSET)
+
+
+def test_disabled_levels_do_not_format_fields(captured):
+    from core.structured_log import get_logger, logged
+
+    def add(a, b):
+        return 2
+
+    add.__module__ = "tests.structured_log"
+    get_logger("tests.structured_log").debug("skipped", value=_Exploding())
+    assert logged(add)(_Exploding(), 1) == 2
+    assert captured() == []
+
+    assert logged(add, level=logging.INFO)(1, b=1) == 2
+    [entry] = captured()
+    assert (entry["event"], entry["function"], entry["args"], entry["kwargs"], entry["result"]) == \
+        ("call", add.__qualname__, "(1,)", "{'b': 1}", 2)
+
+
+def test_events_carry_context_and_are_sampled(captured):
+    from core.structured_log import get_logger, log_context
+
+    log = get_logger("tests.structured_log")
+    with log_context(request_id="r1", schema="IFC4"):
+        with log_context(element_count=3):
+            for index in range(7):
+                log.info("tick", sample=3, index=index, payload=list(range(100)))
+        log.warning("done")
+    log.info("outside")
+
+    ticks = [entry for entry in captured() if entry["event"] == "tick"]
+    assert [entry["index"] for entry in ticks] == [0, 3, 6]
+    assert all(entry["sample_rate"] == 3 and entry["request_id"] == "r1" and entry["element_count"] == 3
+               for entry in ticks)
+    assert ticks[0]["payload"].startswith("[0, 1") and len(ticks[0]["payload"]) < 100
+    done, outside = captured()[3:]
+    assert (done["level"], done["schema"], "element_count" in done) == ("WARNING", "IFC4", False)
+    assert "request_id" not in outside
+
+
+def test_context_reaches_worker_threads(captured):
+    from core.structured_log import get_logger, log_context
+
+    log = get_logger("tests.structured_log")
+
+    async def handle(request_id):
+        with log_context(request_id=request_id):
+            await asyncio.to_thread(log.info, "built")
+
+    async def main():
+        await asyncio.gather(handle("a"), handle("b"))
+
+    asyncio.run(main())
+    assert sorted(entry["request_id"] for entry in captured()) == ["a", "b"]
+
+
+def test_create_file_does_not_print(capsys):
+    from services.ifc_model_manager_factory import IfcModelManagerFactory
+
+    IfcModelManagerFactory.create_manager("IFC4").create_file()
+    assert capsys.readouterr().out == ""
+
+
+def test_logged_samples_each_function_on_its_own(captured):
+    from core.structured_log import logged
+
+    def first():
+        return 1
+
+    def second():
+        return 2
+
+    for func in (first, second):
+        func.__module__ = "tests.structured_log"
+    first, second = logged(first, level=logging.INFO, sample=2), logged(second, level=logging.INFO, sample=2)
+    for _ in range(3):
+        first()
+        second()
+
+    calls = [entry["function"].rsplit(".", 1)[-1] for entry in captured()]
+    assert calls == ["first", "second", "first", "second"]
+    assert all(entry["sample_rate"] == 2 for entry in captured())